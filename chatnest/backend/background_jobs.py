@@ -0,0 +1,102 @@
+import os
+import zlib
+import random
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+class BackgroundJobRunner:
+    """Bounded in-process queue for side effects the client does not wait for.
+
+    Jobs sharing a key always land on the same worker, so they run in the
+    order they were enqueued. Failed jobs are retried with jittered
+    exponential backoff before being counted as failed.
+    """
+
+    def __init__(self):
+        self.worker_count = max(1, int(os.getenv("BACKGROUND_WORKERS", "4")))
+        self.max_queue_size = int(os.getenv("BACKGROUND_QUEUE_SIZE", "1000"))
+        self.max_retries = int(os.getenv("BACKGROUND_MAX_RETRIES", "3"))
+        self.retry_base_delay = float(os.getenv("BACKGROUND_RETRY_BASE_DELAY", "0.5"))
+        self.drain_timeout = float(os.getenv("BACKGROUND_DRAIN_TIMEOUT", "10"))
+        # Split the total capacity across the per-worker queues
+        per_worker = max(1, self.max_queue_size // self.worker_count)
+        self.queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=per_worker) for _ in range(self.worker_count)]
+        self.workers: List[asyncio.Task] = []
+        self.accepting = True
+        self.metrics = {"enqueued": 0, "completed": 0, "failed": 0, "retried": 0, "dropped": 0, "in_flight": 0}
+
+    def enqueue(self, key: str, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> bool:
+        """Queue `func(*args, **kwargs)` without waiting; False if it was dropped"""
+        if not self.accepting:
+            self.metrics["dropped"] += 1
+            print(f"Background job dropped (shutting down): {func.__name__}")
+            return False
+        queue = self.queues[zlib.crc32(key.encode("utf-8")) % self.worker_count]
+        try:
+            queue.put_nowait((key, func, args, kwargs))
+        except asyncio.QueueFull:
+            self.metrics["dropped"] += 1
+            print(f"Background job dropped (queue full): {func.__name__}")
+            return False
+        self.metrics["enqueued"] += 1
+        return True
+
+    async def start(self):
+        if self.workers:
+            return
+        self.accepting = True
+        self.workers = [asyncio.create_task(self._work(queue)) for queue in self.queues]
+        print(f"Background job runner started with {self.worker_count} workers")
+
+    async def _run(self, key: str, func, args, kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                await func(*args, **kwargs)
+                self.metrics["completed"] += 1
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.metrics["failed"] += 1
+                    print(f"Background job {func.__name__} ({key}) failed: {str(e)}")
+                    return
+                self.metrics["retried"] += 1
+                delay = self.retry_base_delay * (2 ** attempt)
+                await asyncio.sleep(random.uniform(delay / 2, delay))
+
+    async def _work(self, queue: asyncio.Queue):
+        while True:
+            key, func, args, kwargs = await queue.get()
+            self.metrics["in_flight"] += 1
+            try:
+                await self._run(key, func, args, kwargs)
+            finally:
+                self.metrics["in_flight"] -= 1
+                queue.task_done()
+
+    async def drain(self, timeout: Optional[float] = None):
+        """Stop accepting jobs, wait for queued ones to finish, then stop the workers"""
+        self.accepting = False
+        timeout = self.drain_timeout if timeout is None else timeout
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self.queues)), timeout)
+        except asyncio.TimeoutError:
+            print(f"Background job drain timed out with {self.queue_depth()} jobs pending")
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    def queue_depth(self) -> int:
+        return sum(queue.qsize() for queue in self.queues)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.metrics,
+            "queue_depth": self.queue_depth(),
+            "queue_capacity": sum(queue.maxsize for queue in self.queues),
+            "workers": len(self.workers),
+            "accepting": self.accepting
+        }
+
+# Global background job runner instance
+job_runner = BackgroundJobRunner()
@@ -0,0 +1,26 @@
+import os
+import sys
+import pytest
+
+os.environ.setdefault("JWT_SECRET", "test-secret")
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    """In-memory MongoDB swapped in for `db` in every backend module that imported it"""
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    import db
+    real_db = db.db
+    mock_db = mongomock_motor.AsyncMongoMockClient()["chatnest"]
+    # pymongo 4.11+ hands UpdateOne's `sort` to the bulk builder, which mongomock doesn't accept yet
+    from mongomock.collection import BulkOperationBuilder
+    add_update = BulkOperationBuilder.add_update
+    monkeypatch.setattr(
+        BulkOperationBuilder, "add_update",
+        lambda self, *args, sort=None, **kwargs: add_update(self, *args, **kwargs)
+    )
+    for module in list(sys.modules.values()):
+        if (getattr(module, "__file__", None) or "").startswith(BACKEND_DIR) and getattr(module, "db", None) is real_db:
+            monkeypatch.setattr(module, "db", mock_db)
+    return mock_db
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Denormalized per-conversation counters (message_count, last_message) shown in
+the conversation list, and a one-off backfill for conversations written
+before they were maintained:
+
+    python conversation_counters.py [--dry-run]
+"""
+
+import asyncio
+import argparse
+from datetime import datetime
+from typing import Optional
+from db import db
+from etags import bump_list_version
+from message_store import message_store
+
+def message_preview(content: str) -> str:
+    return content[:100] + "..." if len(content) > 100 else content
+
+async def update_conversation_counters(conversation_id: str, user_id: str, added: int, last_content: str):
+    """Bump the denormalized message counter, last-message preview and version stamps"""
+    if not conversation_id:
+        return
+    await db.conversations.update_one(
+        {"conversation_id": conversation_id},
+        {
+            "$inc": {"message_count": added, "version": 1},
+            "$set": {"last_message": message_preview(last_content), "updated_at": datetime.utcnow()}
+        }
+    )
+    # The conversation list shows counters and previews too
+    await bump_list_version(user_id)
+
+async def set_conversation_counters(conversation_id: str, message_count: int, last_content: Optional[str]):
+    """Set the counters of a conversation nobody else writes to yet (imports, offline migrations)"""
+    await db.conversations.update_one(
+        {"conversation_id": conversation_id},
+        {"$set": {"message_count": message_count, "last_message": message_preview(last_content or "")}}
+    )
+
+async def recount_conversation(conversation_id: str, attempts: int = 3, store=None) -> Optional[int]:
+    """Recompute a conversation's counters from its stored messages (in `store`,
+    by default the configured message store).
+
+    The write only applies if the conversation's version is unchanged, so a
+    message sent meanwhile (which bumps the version) makes it recount instead
+    of being overwritten. Returns the count, or None if it kept changing.
+    """
+    store = store or message_store
+    for _ in range(attempts):
+        conversation = await db.conversations.find_one(
+            {"conversation_id": conversation_id}, {"_id": 1, "user_id": 1, "version": 1}
+        )
+        if not conversation:
+            return None
+        count = await store.count(conversation_id)
+        content = await store.last_content(conversation_id, 101) if count else ""
+        result = await db.conversations.update_one(
+            {"_id": conversation["_id"], "version": conversation.get("version")},
+            {
+                "$set": {"message_count": count, "last_message": message_preview(content or "")},
+                "$inc": {"version": 1}
+            }
+        )
+        if result.modified_count:
+            await bump_list_version(conversation.get("user_id"))
+            return count
+    return None
+
+async def backfill(dry_run: bool):
+    recounted = 0
+    failed = 0
+    async for conversation in db.conversations.find({}, {"_id": 0, "conversation_id": 1, "message_count": 1}):
+        conversation_id = conversation.get("conversation_id")
+        if not conversation_id:
+            continue
+        if dry_run:
+            count = await message_store.count(conversation_id)
+            if count != conversation.get("message_count"):
+                print(f"{conversation_id}: {conversation.get('message_count')} -> {count}")
+                recounted += 1
+            continue
+        if await recount_conversation(conversation_id) is None:
+            failed += 1
+            print(f"⚠️  {conversation_id} kept changing, run the backfill again")
+        else:
+            recounted += 1
+
+    print("")
+    print(f"✅ Conversations recounted: {recounted}")
+    if failed:
+        print(f"   Conversations that kept changing: {failed}")
+    if dry_run:
+        print("   (dry run - listed conversations whose count is off, nothing was written)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute message_count and last_message of every conversation")
+    parser.add_argument("--dry-run", action="store_true", help="Report conversations whose count is off without writing")
+    args = parser.parse_args()
+
+    print("Backfilling conversation counters...")
+    asyncio.run(backfill(args.dry_run))
@@ -1,17 +1,112 @@
 import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
-from typing import Optional
+from typing import Any, AsyncIterator, Optional
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
 
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
+
+# Connection pool tuning
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "10"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+# zlib ships with Python; snappy and zstd need python-snappy / zstandard installed
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zlib")
+# Local replica sets (see docker-compose.replicaset.yml) run without TLS
+MONGO_TLS = os.getenv("MONGO_TLS", "true").lower() in ("1", "true", "yes")
+MONGO_TLS_ALLOW_INVALID_CERTIFICATES = os.getenv("MONGO_TLS_ALLOW_INVALID_CERTIFICATES", "true").lower() in ("1", "true", "yes")
+
 # Updated MongoDB URI with recommended parameters and ssl options
 mongo_client = AsyncIOMotorClient(
     MONGO_URI,
-    tls=True,
-    tlsAllowInvalidCertificates=True,
+    tls=MONGO_TLS,
+    tlsAllowInvalidCertificates=MONGO_TLS_ALLOW_INVALID_CERTIFICATES,
     serverSelectionTimeoutMS=5000,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+    compressors=MONGO_COMPRESSORS or None,
 )
 db = mongo_client["chatnest"]
+
+async def ping() -> float:
+    """Round-trip a ping to MongoDB and return the latency in milliseconds"""
+    started = time.perf_counter()
+    await db.command("ping")
+    return (time.perf_counter() - started) * 1000
+
+async def warm_up(connections: int = MONGO_MIN_POOL_SIZE) -> float:
+    """Ping MongoDB, then open `connections` pooled connections concurrently.
+
+    Each concurrent ping checks out its own socket, so the pool is already
+    populated when the first real request arrives.
+    """
+    latency = await ping()
+    if connections > 1:
+        await asyncio.gather(*(ping() for _ in range(connections)))
+    return latency
+
+# Explicit projections so every read only transfers the fields it returns
+USER_PROJECTION = {"uid": 1, "username": 1, "email": 1, "list_version": 1}
+OWNERSHIP_PROJECTION = {"_id": 1}
+CONVERSATION_VERSION_PROJECTION = {"_id": 1, "version": 1}
+CONVERSATION_PROJECTION = {"conversation_id": 1, "title": 1, "user_id": 1, "user_ids": 1, "created_at": 1, "last_message": 1, "message_count": 1}
+CONVERSATION_DETAILS_PROJECTION = {"_id": 0, "title": 1, "created_at": 1, "version": 1}
+MESSAGE_PROJECTION = {"user_id": 1, "content": 1, "timestamp": 1, "conversation_id": 1}
+
+# Read scaling on a replica set: each class of reads has its own read
+# preference, so history and analytics load can move to secondaries
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+# -1 means no limit; MongoDB requires at least 90 seconds otherwise
+MONGO_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_MAX_STALENESS_SECONDS", "-1"))
+
+def read_preference(mode: str):
+    """Build a pymongo read preference from its mode name"""
+    if mode not in READ_PREFERENCE_MODES:
+        raise ValueError(f"Unknown read preference {mode!r}, expected one of {', '.join(READ_PREFERENCE_MODES)}")
+    if mode == "primary":
+        return Primary()
+    return READ_PREFERENCE_MODES[mode](max_staleness=MONGO_MAX_STALENESS_SECONDS)
+
+# Conversation lists and message history
+HISTORY_READ_PREFERENCE = read_preference(os.getenv("MONGO_READ_PREFERENCE_HISTORY", "primaryPreferred"))
+# Stats aggregation and usage analytics, which tolerate slightly stale data
+ANALYTICS_READ_PREFERENCE = read_preference(os.getenv("MONGO_READ_PREFERENCE_ANALYTICS", "secondaryPreferred"))
+
+# Reads that may hit a secondary run in a causally consistent session. The
+# route first reads its version stamp from the primary in that session, which
+# makes the secondary wait until it has caught up to that point, so users
+# always read their own writes no matter which worker handled the write.
+MONGO_CAUSAL_CONSISTENCY = os.getenv("MONGO_CAUSAL_CONSISTENCY", "true").lower() in ("1", "true", "yes")
+# Snapshot reads need a replica set running MongoDB 5.0 or newer
+MONGO_SNAPSHOT_READS = os.getenv("MONGO_SNAPSHOT_READS", "false").lower() in ("1", "true", "yes")
+
+@asynccontextmanager
+async def causal_session() -> AsyncIterator[Any]:
+    """Causally consistent session, or None (no session) when disabled"""
+    if not MONGO_CAUSAL_CONSISTENCY:
+        yield None
+        return
+    async with await mongo_client.start_session(causal_consistency=True) as session:
+        yield session
+
+@asynccontextmanager
+async def snapshot_session() -> AsyncIterator[Any]:
+    """Session whose reads all see one point in time, or None when snapshot reads are off"""
+    if not MONGO_SNAPSHOT_READS:
+        yield None
+        return
+    async with await mongo_client.start_session(snapshot=True, causal_consistency=False) as session:
+        yield session
@@ -0,0 +1,115 @@
+import os
+import re
+import time
+import random
+import asyncio
+import contextvars
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+import pymongo
+from pymongo.errors import PyMongoError
+from fastapi.responses import JSONResponse
+
+# Every request gets an end-to-end budget. Upstream calls (MongoDB, MCP,
+# Mistral, Firebase) cap their own timeouts by what is left of it, and
+# retries only happen while there is budget for them.
+DEADLINE_HEADER = "x-request-timeout"  # seconds
+DEFAULT_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "15"))
+MAX_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_MAX_SECONDS", "120"))
+
+# First matching pattern wins; None means the route has no deadline
+ROUTE_DEADLINES: List[Tuple[re.Pattern, Optional[float]]] = [
+    (re.compile(r"^/(export|import)$"), None),
+    (re.compile(r"^/conversations/[^/]+/turn$"), 60.0),
+    (re.compile(r"^/ai/"), 40.0),
+    (re.compile(r"^/mcp/"), 30.0),
+    (re.compile(r"^/ready$"), 3.0),
+]
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+class DeadlineExceeded(Exception):
+    """Raised when the request's budget is spent before an upstream call could start"""
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget, or None without a deadline"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+def timeout_for(default: float) -> float:
+    """Timeout for one upstream call: `default`, capped by the remaining budget"""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(default, left)
+
+async def retry_async(func: Callable[[], Awaitable[Any]], attempts: int = 3, base_delay: float = 0.25,
+                      max_delay: float = 2.0, retryable: Callable[[Exception], bool] = lambda e: True):
+    """Await `func()` up to `attempts` times with full-jitter exponential backoff.
+
+    A retry is skipped (and the last error raised) when the backoff would not
+    leave any budget for another attempt.
+    """
+    for attempt in range(attempts):
+        try:
+            return await func()
+        except Exception as e:
+            if attempt == attempts - 1 or not retryable(e):
+                raise
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            left = remaining()
+            if left is not None and left <= delay:
+                raise
+            await asyncio.sleep(delay)
+
+def route_deadline(path: str) -> Optional[float]:
+    for pattern, seconds in ROUTE_DEADLINES:
+        if pattern.search(path):
+            return seconds
+    return DEFAULT_DEADLINE_SECONDS
+
+class DeadlineMiddleware:
+    """Set the request deadline from X-Request-Timeout or the route default"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        budget = route_deadline(scope["path"])
+        for name, value in scope["headers"]:
+            if name.decode("latin-1").lower() == DEADLINE_HEADER:
+                try:
+                    requested = float(value.decode("latin-1"))
+                    if requested > 0:
+                        budget = min(requested, MAX_DEADLINE_SECONDS)
+                except ValueError:
+                    pass
+                break
+
+        if budget is None or budget <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        token = _deadline.set(time.monotonic() + budget)
+        try:
+            # pymongo.timeout bounds every MongoDB operation in this request
+            with pymongo.timeout(budget):
+                await self.app(scope, receive, send)
+        finally:
+            _deadline.reset(token)
+
+async def deadline_exceeded_handler(request, exc):
+    return JSONResponse(status_code=504, content={"detail": "Request deadline exceeded"})
+
+async def mongo_error_handler(request, exc: PyMongoError):
+    if exc.timeout:
+        return JSONResponse(status_code=504, content={"detail": "Database operation timed out"})
+    print(f"Database error: {exc}")
+    return JSONResponse(status_code=500, content={"detail": "Database error"})
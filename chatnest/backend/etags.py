@@ -0,0 +1,40 @@
+import hashlib
+from typing import Optional
+from fastapi import Request, Response
+from db import db
+
+# Version stamps live on documents the routes read anyway:
+#   users.list_version          - bumped when the user's conversation list changes
+#   conversations.version       - bumped when a conversation's messages change
+# so checking If-None-Match costs no extra query.
+
+def make_etag(user_id: str, scope: str, version: Optional[int], variant: str = "json") -> Optional[str]:
+    """Strong ETag for one user's view of a versioned resource, or None if unversioned"""
+    if version is None:
+        return None
+    digest = hashlib.sha1(f"{user_id}|{scope}|{version}|{variant}".encode("utf-8")).hexdigest()
+    return f'"{digest[:24]}"'
+
+def is_not_modified(request: Request, etag: Optional[str]) -> bool:
+    """True when the request's If-None-Match already names `etag`"""
+    if not etag:
+        return False
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so a W/ prefix still matches
+    candidates = [tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip() for tag in header.split(",")]
+    return etag in candidates
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept"})
+
+async def bump_list_version(user_id: str):
+    """Invalidate cached conversation lists of a user.
+
+    Users that only exist in Firebase have no document, hence no version and
+    no ETag, so skipping the upsert here is safe.
+    """
+    await db.users.update_one({"uid": user_id}, {"$inc": {"list_version": 1}})
@@ -7,6 +7,7 @@ import os
 import requests
 import json
 from dotenv import load_dotenv
+from deadlines import timeout_for
 
 load_dotenv()
 
@@ -48,7 +49,7 @@ class FirebaseConfig:
                     "returnSecureToken": True
                 }
                 
-                response = requests.post(url, json=data)
+                response = requests.post(url, json=data, timeout=timeout_for(10))
                 result = response.json()
                 
                 if response.status_code == 200:
@@ -90,7 +91,7 @@ class FirebaseConfig:
                     "returnSecureToken": True
                 }
                 
-                response = requests.post(url, json=data)
+                response = requests.post(url, json=data, timeout=timeout_for(10))
                 result = response.json()
                 
                 if response.status_code == 200:
@@ -0,0 +1,107 @@
+import os
+import json
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional, Type
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pymongo.errors import DuplicateKeyError
+from db import db
+from deadlines import MAX_DEADLINE_SECONDS
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# A pending key is locked this long; a retry may take it over afterwards, so a
+# request that was cancelled or whose worker died doesn't block the key until
+# the TTL. Defaults to the longest request deadline, which bounds live requests.
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", str(MAX_DEADLINE_SECONDS)))
+MAX_KEY_LENGTH = 255
+
+async def ensure_indexes():
+    await db.idempotency_keys.create_index([("user_id", 1), ("key", 1)], unique=True)
+    # MongoDB's TTL monitor deletes keys once they are older than the TTL
+    await db.idempotency_keys.create_index("created_at", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS)
+
+def _fingerprint(request: Request, payload: Any) -> str:
+    body = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{request.method} {request.url.path}?{request.url.query}\n{body}".encode("utf-8")).hexdigest()
+
+async def run_idempotent(request: Request, user_id: str, payload: Any,
+                         handler: Callable[[], Awaitable[Any]], response_model: Optional[Type[BaseModel]] = None):
+    """Run `handler` at most once per (user, Idempotency-Key).
+
+    Without the header the handler simply runs. A replay of a completed
+    request returns the stored response without writing again; a replay
+    while the first request is still running gets 409, and reusing a key for
+    a different request gets 422. A pending key whose lock expired (its
+    request was cancelled or its worker died) is taken over by the retry.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return await handler()
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters")
+
+    fingerprint = _fingerprint(request, payload)
+    now = datetime.utcnow()
+    locked_until = now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+    # MongoDB keeps milliseconds; truncate so the lease filters below match
+    locked_until = locked_until.replace(microsecond=locked_until.microsecond // 1000 * 1000)
+    try:
+        await db.idempotency_keys.insert_one({
+            "user_id": user_id,
+            "key": key,
+            "fingerprint": fingerprint,
+            "status": "pending",
+            "locked_until": locked_until,
+            "created_at": now
+        })
+    except DuplicateKeyError:
+        existing = await db.idempotency_keys.find_one(
+            {"user_id": user_id, "key": key},
+            {"_id": 0, "fingerprint": 1, "status": 1, "locked_until": 1, "response": 1}
+        )
+        if not existing:
+            raise HTTPException(status_code=409, detail="Idempotency key expired while in use, retry the request")
+        if existing["fingerprint"] != fingerprint:
+            raise HTTPException(status_code=422, detail=f"{IDEMPOTENCY_HEADER} was already used for a different request")
+        if existing["status"] == "completed":
+            return JSONResponse(content=existing["response"], headers={"Idempotent-Replayed": "true"})
+        if not await _take_over(user_id, key, existing, now, locked_until):
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still in progress",
+                headers={"Retry-After": "1"}
+            )
+
+    lease = {"user_id": user_id, "key": key, "status": "pending", "locked_until": locked_until}
+    try:
+        result = await handler()
+    except BaseException:
+        # Let the client retry with the same key after a failure or a
+        # cancellation; shielded so a cancelled request still releases its lock
+        await asyncio.shield(db.idempotency_keys.delete_one(lease))
+        raise
+
+    # Store exactly what the client receives, i.e. the response_model's output
+    if response_model is not None and isinstance(result, dict):
+        result = response_model(**result)
+    await db.idempotency_keys.update_one(
+        lease,
+        {"$set": {"status": "completed", "response": jsonable_encoder(result)}, "$unset": {"locked_until": ""}}
+    )
+    return result
+
+async def _take_over(user_id: str, key: str, existing: dict, now: datetime, locked_until: datetime) -> bool:
+    """Claim a pending key whose lock has expired; only one concurrent retry wins"""
+    previous = existing.get("locked_until")
+    if previous is not None and previous > now:
+        return False
+    result = await db.idempotency_keys.update_one(
+        {"user_id": user_id, "key": key, "status": "pending", "locked_until": previous},
+        {"$set": {"locked_until": locked_until}}
+    )
+    return result.modified_count == 1
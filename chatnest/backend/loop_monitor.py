@@ -0,0 +1,150 @@
+import os
+import re
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from fastapi.responses import JSONResponse
+from stats import percentile
+
+class LoopLagMonitor:
+    """Sample event-loop lag and, in debug mode, catch the code blocking the loop.
+
+    A coroutine sleeps for `interval` and records how late it wakes up. In
+    debug mode a watchdog thread notices when that coroutine stops waking up
+    and prints the stack of whatever is running on the loop thread.
+    """
+
+    def __init__(self):
+        self.interval = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "100")) / 1000
+        self.debug = os.getenv("LOOP_MONITOR_DEBUG", "false").lower() in ("1", "true", "yes")
+        self.blocking_threshold = float(os.getenv("LOOP_BLOCKING_THRESHOLD_MS", "100")) / 1000
+        self.samples: Deque[float] = deque(maxlen=int(os.getenv("LOOP_MONITOR_WINDOW", "600")))
+        self.blocking_events = 0
+        self.recent_blocks: Deque[Dict[str, Any]] = deque(maxlen=20)
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+
+    async def start(self):
+        if self._task:
+            return
+        loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._sample())
+        if self.debug:
+            # asyncio's own debug mode logs every callback slower than this
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.blocking_threshold
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+        print(f"Event loop monitor started (debug={self.debug})")
+
+    async def stop(self):
+        self._stopping.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self.samples.append(lag * 1000)
+            self._heartbeat = time.monotonic()
+
+    def _watch(self):
+        reported = False
+        while not self._stopping.wait(self.blocking_threshold / 2):
+            stalled = time.monotonic() - self._heartbeat - self.interval
+            if stalled < self.blocking_threshold:
+                reported = False
+                continue
+            if reported:
+                continue
+            # Only report each stall once, with the stack at the moment we noticed it
+            reported = True
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else ""
+            self.blocking_events += 1
+            self.recent_blocks.append({
+                "detected_at": time.time(),
+                "stalled_ms": round(stalled * 1000, 2),
+                "stack": stack
+            })
+            print(f"⚠️  Event loop blocked for {stalled * 1000:.0f} ms:\n{stack}")
+
+    def current_lag_ms(self) -> float:
+        """Worst lag over the last few samples, including a stall still in progress"""
+        recent = list(self.samples)[-5:]
+        stalled = max(0.0, time.monotonic() - self._heartbeat - self.interval) * 1000 if self._task else 0.0
+        return max(recent + [stalled])
+
+    def stats(self) -> Dict[str, Any]:
+        samples = list(self.samples)
+        return {
+            "running": self._task is not None,
+            "interval_ms": self.interval * 1000,
+            "samples": len(samples),
+            "current_lag_ms": round(self.current_lag_ms(), 2),
+            "p50_ms": percentile(samples, 50),
+            "p90_ms": percentile(samples, 90),
+            "p99_ms": percentile(samples, 99),
+            "max_ms": round(max(samples), 2) if samples else None,
+            "debug": self.debug,
+            "blocking_events": self.blocking_events,
+            "recent_blocks": list(self.recent_blocks) if self.debug else []
+        }
+
+# Requests to these paths (or sent with "X-Priority: low") are shed first
+LOW_PRIORITY_PATHS = re.compile(r"^/(conversations/stats|analytics/|export|ai/routing)")
+NEVER_SHED_PATHS = re.compile(r"^/(ready|metrics/)")
+
+class LoadSheddingMiddleware:
+    """Reject new low-priority requests with 503 while event-loop lag is above a threshold"""
+
+    def __init__(self, app, monitor: LoopLagMonitor):
+        self.app = app
+        self.monitor = monitor
+        self.enabled = os.getenv("LOAD_SHEDDING_ENABLED", "false").lower() in ("1", "true", "yes")
+        self.lag_threshold_ms = float(os.getenv("LOAD_SHEDDING_LAG_MS", "200"))
+        self.shed = 0
+
+    def _low_priority(self, scope) -> bool:
+        if NEVER_SHED_PATHS.search(scope["path"]):
+            return False
+        for name, value in scope["headers"]:
+            if name == b"x-priority":
+                return value.strip().lower() == b"low"
+        return bool(LOW_PRIORITY_PATHS.search(scope["path"]))
+
+    async def __call__(self, scope, receive, send):
+        if (
+            self.enabled
+            and scope["type"] == "http"
+            and scope["method"] != "OPTIONS"
+            and self.monitor.current_lag_ms() > self.lag_threshold_ms
+            and self._low_priority(scope)
+        ):
+            self.shed += 1
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server busy, retry shortly"},
+                headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+# Global event loop monitor instance
+loop_monitor = LoopLagMonitor()
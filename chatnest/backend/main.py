@@ -1,16 +1,30 @@
 import os
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
-from db import db
+from db import db, ping, warm_up
 from routes import router
 from fastapi.middleware.cors import CORSMiddleware
 from mcp_integration import mcp_integration
 from firebase_config import firebase_config
+from message_store import message_store
+from background_jobs import job_runner
+from negotiation import CompressionMiddleware
+from deadlines import DeadlineMiddleware, DeadlineExceeded, deadline_exceeded_handler, mongo_error_handler
+from pymongo.errors import PyMongoError
+from loop_monitor import loop_monitor, LoadSheddingMiddleware
+from usage_rollups import ensure_indexes as ensure_usage_indexes
+from idempotency import ensure_indexes as ensure_idempotency_indexes
 
 load_dotenv()
 
 app = FastAPI(title="ChatNest Backend", description="ChatNest with MCP Integration")
 
+# Added first so it runs inside CORS: shed 503s still carry CORS headers and
+# preflights are answered by CORS before reaching it
+app.add_middleware(LoadSheddingMiddleware, monitor=loop_monitor)
+
 # Add CORS middleware with restricted origins
 app.add_middleware(
     CORSMiddleware,
@@ -27,21 +41,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip/brotli for large responses (message histories, long AI answers)
+app.add_middleware(CompressionMiddleware)
+
+# Per-request deadline (X-Request-Timeout header or route default) bounding all upstream calls
+app.add_middleware(DeadlineMiddleware)
+app.add_exception_handler(DeadlineExceeded, deadline_exceeded_handler)
+app.add_exception_handler(PyMongoError, mongo_error_handler)
+
 app.include_router(router)
 
+# Set once MongoDB has been warmed; /ready reports 503 until then
+readiness = {"mongo_warm": False, "mongo_warmup_ms": None}
+WARM_UP_MAX_RETRY_DELAY = 30.0
+warm_up_retry_task = None
+
+async def _warm_up_mongo() -> bool:
+    try:
+        latency = await warm_up()
+        await message_store.ensure_indexes()
+        await ensure_usage_indexes()
+        await ensure_idempotency_indexes()
+        readiness["mongo_warm"] = True
+        readiness["mongo_warmup_ms"] = round(latency, 2)
+        print(f"MongoDB connected successfully ({latency:.1f} ms)")
+        return True
+    except Exception as e:
+        print(f"MongoDB warm-up failed: {str(e)}")
+        return False
+
+async def _retry_warm_up_mongo():
+    """Keep retrying warm-up with backoff, so a worker that started during a
+    MongoDB blip becomes ready instead of reporting 503 forever"""
+    delay = 1.0
+    while not await _warm_up_mongo():
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, WARM_UP_MAX_RETRY_DELAY)
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize MCP client, Firebase, and MongoDB on startup"""
+    global warm_up_retry_task
     print("Initializing MCP integration...")
-    await mcp_integration.initialize()
+    await loop_monitor.start()
+    _, mongo_warm, _ = await asyncio.gather(mcp_integration.initialize(), _warm_up_mongo(), job_runner.start())
+    if not mongo_warm:
+        warm_up_retry_task = asyncio.create_task(_retry_warm_up_mongo())
+    print(f"Message storage layout: {message_store.layout}")
     print("Firebase Auth initialized successfully")
-    print("MongoDB connected successfully")
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Clean up MCP client on shutdown"""
+    """Drain background jobs and clean up MCP client on shutdown"""
+    if warm_up_retry_task:
+        warm_up_retry_task.cancel()
+    print("Draining background jobs...")
+    await job_runner.drain()
     print("Closing MCP integration...")
     await mcp_integration.close()
+    await loop_monitor.stop()
 
 @app.get("/")
 def read_root():
@@ -50,3 +108,37 @@ def read_root():
         "mcp_connected": mcp_integration.is_connected,
         "version": "1.0.0"
     }
+
+@app.get("/ready")
+async def readiness_probe():
+    """Readiness probe for load balancers: 200 only once dependencies respond"""
+    checks = {}
+    ready = readiness["mongo_warm"]
+
+    try:
+        latency = await asyncio.wait_for(ping(), timeout=2)
+        checks["mongodb"] = {"ok": True, "latency_ms": round(latency, 2)}
+    except Exception as e:
+        checks["mongodb"] = {"ok": False, "error": str(e) or type(e).__name__}
+        ready = False
+
+    checks["mcp"] = {"ok": mcp_integration.is_connected}
+
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "warmup_ms": readiness["mongo_warmup_ms"],
+            "checks": checks
+        }
+    )
+
+@app.get("/metrics/jobs")
+def background_job_metrics():
+    """Background job queue depth and outcome counters"""
+    return job_runner.stats()
+
+@app.get("/metrics/loop")
+def event_loop_metrics():
+    """Event loop lag percentiles and detected blocking calls"""
+    return loop_monitor.stats()
@@ -4,6 +4,7 @@ import asyncio
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 import httpx
+from deadlines import timeout_for, retry_async
 
 class MCPIntegration:
     def __init__(self):
@@ -12,6 +13,20 @@ class MCPIntegration:
         self.server_url = os.getenv("MCP_SERVER_URL", "http://localhost:9000/mcp")
         self.is_connected = False
         
+    async def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> httpx.Response:
+        """Call the MCP server, retrying connection errors within the request deadline"""
+        async def attempt():
+            async with httpx.AsyncClient(timeout=timeout_for(30)) as client:
+                if method == "GET":
+                    return await client.get(f"{self.server_url}/{path}")
+                return await client.post(
+                    f"{self.server_url}/{path}",
+                    json=payload,
+                    headers={"Content-Type": "application/json"}
+                )
+        
+        return await retry_async(attempt, retryable=lambda e: isinstance(e, httpx.TransportError))
+    
     async def initialize(self):
         """Initialize MCP client connection"""
         try:
@@ -40,26 +55,21 @@ class MCPIntegration:
             }
             
             # Send message to MCP server via HTTP
-            async with httpx.AsyncClient(timeout=30) as client:
-                response = await client.post(
-                    f"{self.server_url}/message",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return {
-                        "response": data.get("response", "No response received"),
-                        "success": True,
-                        "timestamp": datetime.utcnow().isoformat()
-                    }
-                else:
-                    return {
-                        "response": f"MCP server error: {response.status_code}",
-                        "success": False,
-                        "timestamp": datetime.utcnow().isoformat()
-                    }
+            response = await self._request("POST", "message", payload)
+            
+            if response.status_code == 200:
+                data = response.json()
+                return {
+                    "response": data.get("response", "No response received"),
+                    "success": True,
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+            else:
+                return {
+                    "response": f"MCP server error: {response.status_code}",
+                    "success": False,
+                    "timestamp": datetime.utcnow().isoformat()
+                }
                     
         except Exception as e:
             return {
@@ -74,12 +84,11 @@ class MCPIntegration:
             await self.initialize()
         
         try:
-            async with httpx.AsyncClient(timeout=30) as client:
-                response = await client.get(f"{self.server_url}/tools")
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    return []
+            response = await self._request("GET", "tools")
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return []
         except Exception as e:
             print(f"Failed to get tools: {str(e)}")
             return []
@@ -96,27 +105,22 @@ class MCPIntegration:
                 "client_id": self.client_id
             }
             
-            async with httpx.AsyncClient(timeout=30) as client:
-                response = await client.post(
-                    f"{self.server_url}/tool",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return {
-                        "result": data.get("result"),
-                        "success": True,
-                        "timestamp": datetime.utcnow().isoformat()
-                    }
-                else:
-                    return {
-                        "result": None,
-                        "success": False,
-                        "error": f"Tool call failed: {response.status_code}",
-                        "timestamp": datetime.utcnow().isoformat()
-                    }
+            response = await self._request("POST", "tool", payload)
+            
+            if response.status_code == 200:
+                data = response.json()
+                return {
+                    "result": data.get("result"),
+                    "success": True,
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+            else:
+                return {
+                    "result": None,
+                    "success": False,
+                    "error": f"Tool call failed: {response.status_code}",
+                    "timestamp": datetime.utcnow().isoformat()
+                }
         except Exception as e:
             return {
                 "result": None,
@@ -137,13 +141,8 @@ class MCPIntegration:
                 "timestamp": datetime.utcnow().isoformat()
             }
             
-            async with httpx.AsyncClient(timeout=30) as client:
-                response = await client.post(
-                    f"{self.server_url}/context",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                return response.status_code == 200
+            response = await self._request("POST", "context", payload)
+            return response.status_code == 200
         except Exception as e:
             print(f"Failed to send context: {str(e)}")
             return False
@@ -0,0 +1,281 @@
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from db import db, MESSAGE_PROJECTION
+
+# "document" stores one document per message in db.messages, "bucket" groups
+# each conversation's messages into fixed-size documents in db.message_buckets
+MESSAGE_STORAGE_LAYOUT = os.getenv("MESSAGE_STORAGE_LAYOUT", "document").lower()
+MESSAGE_BUCKET_SIZE = int(os.getenv("MESSAGE_BUCKET_SIZE", "200"))
+
+class DocumentMessageStore:
+    """One document per message (the original layout).
+
+    Reads take an optional `session` (see db.causal_session) and a
+    `read_preference` to route them to replica set secondaries.
+    """
+    layout = "document"
+
+    @property
+    def collection(self):
+        return db.messages
+
+    def _reader(self, read_preference=None):
+        return db.get_collection(self.collection.name, read_preference=read_preference) if read_preference else self.collection
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("conversation_id", 1), ("timestamp", 1)])
+        await self.collection.create_index("user_id")
+
+    async def insert(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a message and return it with its new _id"""
+        result = await self.collection.insert_one(message)
+        message["_id"] = result.inserted_id
+        return message
+
+    async def insert_many(self, messages: List[Dict[str, Any]]):
+        if messages:
+            await self.collection.insert_many(messages, ordered=False)
+
+    async def find(self, conversation_id: str, batch_size: Optional[int] = None,
+                   session=None, read_preference=None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield a conversation's messages, oldest first"""
+        cursor = self._reader(read_preference).find(
+            {"conversation_id": conversation_id}, MESSAGE_PROJECTION, session=session
+        )
+        if batch_size:
+            cursor = cursor.batch_size(batch_size)
+        async for doc in cursor.sort("timestamp", 1):
+            yield doc
+
+    async def recent(self, conversation_id: str, limit: int, session=None, read_preference=None) -> List[Dict[str, Any]]:
+        """The newest `limit` messages of a conversation, oldest first"""
+        if limit <= 0:
+            return []
+        cursor = self._reader(read_preference).find(
+            {"conversation_id": conversation_id}, MESSAGE_PROJECTION, session=session
+        ).sort("timestamp", -1).limit(limit)
+        messages = [doc async for doc in cursor]
+        messages.reverse()
+        return messages
+
+    async def count(self, conversation_id: str, session=None, read_preference=None) -> int:
+        return await self._reader(read_preference).count_documents({"conversation_id": conversation_id}, session=session)
+
+    async def count_for_user(self, user_id: str, session=None, read_preference=None) -> int:
+        return await self._reader(read_preference).count_documents({"user_id": user_id}, session=session)
+
+    async def last_content(self, conversation_id: str, length: int, session=None, read_preference=None) -> Optional[str]:
+        """Content of the newest message, cut down server-side to `length` characters"""
+        doc = await self._reader(read_preference).find_one(
+            {"conversation_id": conversation_id},
+            {"_id": 0, "content": {"$substrCP": [{"$ifNull": ["$content", ""]}, 0, length]}},
+            sort=[("timestamp", -1)],
+            session=session
+        )
+        return doc.get("content", "") if doc else None
+
+    def count_lookup_stages(self) -> List[Dict[str, Any]]:
+        """Aggregation stages adding a `message_count` field to conversation documents"""
+        return [
+            {"$lookup": {
+                "from": "messages",
+                "localField": "conversation_id",
+                "foreignField": "conversation_id",
+                # Only join message ids; the full documents are never used
+                "pipeline": [{"$project": {"_id": 1}}],
+                "as": "message_count"
+            }},
+            {"$addFields": {"message_count": {"$size": "$message_count"}}},
+        ]
+
+class BucketMessageStore:
+    """Messages grouped per conversation into documents of up to `bucket_size` messages.
+
+    Bucket documents look like::
+
+        {"_id": "<conversation_id>:<seq>", "conversation_id": ..., "seq": 0, "count": 3,
+         "first_ts": ..., "last_ts": ...,
+         "messages": [{"_id": ObjectId, "user_id": ..., "content": ..., "timestamp": ...}]}
+
+    Buckets are read in `seq` order and only the last one is appended to, so
+    no bucket between the first and the last has room. migrate_messages.py
+    may prepend older history with lower (negative) `seq`s.
+    """
+    layout = "bucket"
+
+    def __init__(self, bucket_size: int = MESSAGE_BUCKET_SIZE):
+        self.bucket_size = bucket_size
+
+    @property
+    def collection(self):
+        return db.message_buckets
+
+    def _reader(self, read_preference=None):
+        return db.get_collection(self.collection.name, read_preference=read_preference) if read_preference else self.collection
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("conversation_id", 1), ("seq", 1)])
+        await self.collection.create_index("messages.user_id")
+
+    @staticmethod
+    def _entry(message: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "_id": message.get("_id") or ObjectId(),
+            "user_id": message.get("user_id"),
+            "content": message.get("content"),
+            "timestamp": message.get("timestamp") or datetime.utcnow(),
+        }
+
+    @staticmethod
+    def bucket(conversation_id: str, seq: int, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Bucket document `seq` of a conversation; its _id is deterministic"""
+        return {
+            "_id": f"{conversation_id}:{seq}",
+            "conversation_id": conversation_id,
+            "seq": seq,
+            "count": len(entries),
+            "first_ts": entries[0]["timestamp"],
+            "last_ts": entries[-1]["timestamp"],
+            "messages": entries,
+        }
+
+    def build_buckets(self, conversation_id: str, messages: Iterable[Dict[str, Any]], first_seq: int = 0) -> List[Dict[str, Any]]:
+        """Pack messages (already sorted by timestamp) into full bucket documents numbered from `first_seq`"""
+        entries = [self._entry(m) for m in messages]
+        return [
+            self.bucket(conversation_id, first_seq + i, entries[start:start + self.bucket_size])
+            for i, start in enumerate(range(0, len(entries), self.bucket_size))
+        ]
+
+    async def last_bucket(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one(
+            {"conversation_id": conversation_id}, {"seq": 1, "count": 1}, sort=[("seq", -1)]
+        )
+
+    async def insert(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        entry = self._entry(message)
+        await self._append(message["conversation_id"], [entry])
+        message.update(entry)
+        return message
+
+    async def insert_many(self, messages: List[Dict[str, Any]]):
+        by_conversation: Dict[str, List[Dict[str, Any]]] = {}
+        for message in messages:
+            message["_id"] = message.get("_id") or ObjectId()
+            by_conversation.setdefault(message["conversation_id"], []).append(message)
+        for conversation_id, group in by_conversation.items():
+            group.sort(key=lambda m: m.get("timestamp") or datetime.utcnow())
+            await self._append(conversation_id, [self._entry(m) for m in group])
+
+    async def _append(self, conversation_id: str, entries: List[Dict[str, Any]]):
+        """Append sorted entries to the last bucket, then to new buckets after it.
+
+        Both writes are conditional so concurrent writers can't fork the
+        history: appends compare-and-set the bucket's count, and writers
+        racing to start bucket `seq` collide on its _id. The loser re-reads
+        the last bucket and retries.
+        """
+        while entries:
+            last = await self.last_bucket(conversation_id)
+            if last is None or last["count"] >= self.bucket_size:
+                head = entries[:self.bucket_size]
+                try:
+                    await self.collection.insert_one(
+                        self.bucket(conversation_id, 0 if last is None else last["seq"] + 1, head)
+                    )
+                except DuplicateKeyError:
+                    continue
+            else:
+                head = entries[:self.bucket_size - last["count"]]
+                result = await self.collection.update_one(
+                    {"_id": last["_id"], "count": last["count"]},
+                    {
+                        "$push": {"messages": {"$each": head, "$sort": {"timestamp": 1}}},
+                        "$inc": {"count": len(head)},
+                        "$min": {"first_ts": head[0]["timestamp"]},
+                        "$max": {"last_ts": head[-1]["timestamp"]},
+                    }
+                )
+                if not result.modified_count:
+                    continue
+            entries = entries[len(head):]
+
+    async def find(self, conversation_id: str, batch_size: Optional[int] = None,
+                   session=None, read_preference=None) -> AsyncIterator[Dict[str, Any]]:
+        cursor = self._reader(read_preference).find(
+            {"conversation_id": conversation_id}, {"_id": 0, "messages": 1}, session=session
+        )
+        if batch_size:
+            # Each bucket already holds many messages
+            cursor = cursor.batch_size(max(1, batch_size // self.bucket_size))
+        async for bucket in cursor.sort("seq", 1):
+            for entry in bucket["messages"]:
+                message = dict(entry)
+                message["conversation_id"] = conversation_id
+                yield message
+
+    async def recent(self, conversation_id: str, limit: int, session=None, read_preference=None) -> List[Dict[str, Any]]:
+        """The newest `limit` messages of a conversation, oldest first"""
+        if limit <= 0:
+            return []
+        # The last bucket may hold a single message, so read one extra
+        cursor = self._reader(read_preference).find(
+            {"conversation_id": conversation_id}, {"_id": 0, "messages": 1}, session=session
+        ).sort("seq", -1).limit(-(-limit // self.bucket_size) + 1)
+        messages: List[Dict[str, Any]] = []
+        async for bucket in cursor:
+            messages[:0] = bucket["messages"]
+        messages = messages[-limit:]
+        for message in messages:
+            message["conversation_id"] = conversation_id
+        return messages
+
+    async def count(self, conversation_id: str, session=None, read_preference=None) -> int:
+        async for doc in self._reader(read_preference).aggregate([
+            {"$match": {"conversation_id": conversation_id}},
+            {"$group": {"_id": None, "count": {"$sum": "$count"}}},
+        ], session=session):
+            return doc["count"]
+        return 0
+
+    async def count_for_user(self, user_id: str, session=None, read_preference=None) -> int:
+        async for doc in self._reader(read_preference).aggregate([
+            {"$match": {"messages.user_id": user_id}},
+            {"$project": {"_id": 0, "count": {"$size": {"$filter": {
+                "input": "$messages.user_id",
+                "cond": {"$eq": ["$$this", user_id]}
+            }}}}},
+            {"$group": {"_id": None, "count": {"$sum": "$count"}}},
+        ], session=session):
+            return doc["count"]
+        return 0
+
+    async def last_content(self, conversation_id: str, length: int, session=None, read_preference=None) -> Optional[str]:
+        doc = await self._reader(read_preference).find_one(
+            {"conversation_id": conversation_id},
+            {"_id": 0, "content": {"$substrCP": [
+                {"$ifNull": [{"$arrayElemAt": ["$messages.content", -1]}, ""]}, 0, length
+            ]}},
+            sort=[("seq", -1)],
+            session=session
+        )
+        return doc.get("content", "") if doc else None
+
+    def count_lookup_stages(self) -> List[Dict[str, Any]]:
+        return [
+            {"$lookup": {
+                "from": "message_buckets",
+                "localField": "conversation_id",
+                "foreignField": "conversation_id",
+                "pipeline": [{"$project": {"_id": 0, "count": 1}}],
+                "as": "buckets"
+            }},
+            {"$addFields": {"message_count": {"$sum": "$buckets.count"}}},
+            {"$project": {"buckets": 0}},
+        ]
+
+# Global message store instance
+message_store = BucketMessageStore() if MESSAGE_STORAGE_LAYOUT == "bucket" else DocumentMessageStore()
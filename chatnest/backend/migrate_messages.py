@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Migrate messages from one-document-per-message storage (db.messages)
+into bucket documents (db.message_buckets)
+"""
+
+import asyncio
+import argparse
+from db import db
+from message_store import BucketMessageStore, MESSAGE_BUCKET_SIZE
+from conversation_counters import recount_conversation
+
+async def migrate_conversation(store: BucketMessageStore, conversation_id: str, dry_run: bool) -> int:
+    """Copy the conversation's messages that aren't in a bucket yet; returns how many.
+
+    Bucket entries keep the source message's _id, so a re-run only copies what
+    an earlier (crashed) run or live bucket writes after a layout switch left
+    out. Messages older than the first bucket are prepended with lower seqs,
+    the rest are appended.
+    """
+    present = set()
+    async for bucket in store.collection.find({"conversation_id": conversation_id}, {"_id": 0, "messages._id": 1}):
+        present.update(entry["_id"] for entry in bucket.get("messages", []))
+    first = await store.collection.find_one(
+        {"conversation_id": conversation_id}, {"seq": 1, "first_ts": 1}, sort=[("seq", 1)]
+    )
+
+    cursor = db.messages.find(
+        {"conversation_id": conversation_id},
+        {"conversation_id": 1, "user_id": 1, "content": 1, "timestamp": 1}
+    ).sort("timestamp", 1)
+
+    # Newer messages are appended one bucket's worth at a time
+    older = []
+    chunk = []
+    count = 0
+    async for message in cursor:
+        if message["_id"] in present:
+            continue
+        count += 1
+        if first is not None and message.get("timestamp") and message["timestamp"] < first["first_ts"]:
+            older.append(message)
+            continue
+        chunk.append(message)
+        if len(chunk) == store.bucket_size:
+            if not dry_run:
+                await store.insert_many(chunk)
+            chunk = []
+    if chunk and not dry_run:
+        await store.insert_many(chunk)
+
+    if older and not dry_run:
+        # Newest first, so a crash leaves a gap-free prefix of the history behind
+        seq = first["seq"]
+        end = len(older)
+        while end > 0:
+            start = max(0, end - store.bucket_size)
+            seq -= 1
+            await store.collection.insert_one(store.build_buckets(conversation_id, older[start:end], seq)[0])
+            end = start
+    return count
+
+async def migrate(bucket_size: int, delete_source: bool, dry_run: bool):
+    store = BucketMessageStore(bucket_size)
+    if not dry_run:
+        await store.ensure_indexes()
+
+    migrated_conversations = 0
+    migrated_messages = 0
+    skipped = 0
+
+    conversation_ids = db.messages.aggregate(
+        [{"$group": {"_id": "$conversation_id"}}, {"$sort": {"_id": 1}}],
+        allowDiskUse=True
+    )
+    async for group in conversation_ids:
+        conversation_id = group["_id"]
+        if conversation_id is None:
+            skipped += 1
+            continue
+
+        count = await migrate_conversation(store, conversation_id, dry_run)
+
+        if count and not dry_run:
+            # Conversations written before counters were maintained get them here
+            await recount_conversation(conversation_id, store=store)
+
+        if delete_source and not dry_run:
+            await db.messages.delete_many({"conversation_id": conversation_id})
+
+        if not count:
+            # Every message is already in a bucket
+            skipped += 1
+            continue
+        migrated_conversations += 1
+        migrated_messages += count
+        print(f"Migrated {count} messages for conversation {conversation_id}")
+
+    print("")
+    print(f"✅ Conversations migrated: {migrated_conversations}")
+    print(f"   Messages migrated: {migrated_messages}")
+    print(f"   Conversations skipped: {skipped}")
+    if dry_run:
+        print("   (dry run - nothing was written)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move messages into bucket documents")
+    parser.add_argument("--bucket-size", type=int, default=MESSAGE_BUCKET_SIZE, help="Messages per bucket document")
+    parser.add_argument("--delete-source", action="store_true", help="Delete migrated messages from db.messages")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be migrated without writing")
+    args = parser.parse_args()
+
+    print("Migrating messages to bucket storage...")
+    asyncio.run(migrate(args.bucket_size, args.delete_source, args.dry_run))
@@ -0,0 +1,134 @@
+import os
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
+import httpx
+from deadlines import timeout_for, retry_async
+
+MISTRAL_API_URL = 'https://api.mistral.ai/v1/chat/completions'
+DEFAULT_MODEL = 'mistral-large-latest'
+DEFAULT_MAX_TOKENS = 4000
+# Earlier messages of a conversation sent along with a chat turn: at most this
+# many, and only the newest that fit in the character budget
+CHAT_HISTORY_MESSAGES = int(os.getenv('CHAT_HISTORY_MESSAGES', '20'))
+CHAT_HISTORY_MAX_CHARS = int(os.getenv('CHAT_HISTORY_MAX_CHARS', '16000'))
+SYSTEM_PROMPT = 'You are a helpful AI assistant. Provide responses that are appropriate in length and detail for what the user is asking. Be natural and comprehensive when needed, concise when appropriate.'
+
+class MistralError(Exception):
+    """Raised when the Mistral API returns an error or an unexpected payload"""
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+def get_api_key() -> Optional[str]:
+    """Configured Mistral API key, or None when unset or still the placeholder"""
+    api_key = os.getenv('MISTRAL_API_KEY')
+    if not api_key or api_key in ("your-mistral-api-key", "your-mistral-api-key-here"):
+        return None
+    return api_key
+
+def build_messages(message: str, history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+    return [{'role': 'system', 'content': SYSTEM_PROMPT}, *(history or []), {'role': 'user', 'content': message}]
+
+def history_messages(stored: List[Dict[str, Any]], max_chars: int = CHAT_HISTORY_MAX_CHARS) -> List[Dict[str, str]]:
+    """Chat messages for stored messages (oldest first), keeping the newest that fit in `max_chars`"""
+    history = []
+    total = 0
+    for message in reversed(stored):
+        content = message.get('content') or ''
+        total += len(content)
+        if total > max_chars:
+            break
+        history.append({'role': 'assistant' if message.get('user_id') == 'assistant' else 'user', 'content': content})
+    history.reverse()
+    return history
+
+def _request(messages: List[Dict[str, str]], model: str, max_tokens: int, stream: bool = False) -> Dict[str, Any]:
+    payload = {
+        'model': model,
+        'messages': messages,
+        'temperature': 0.7,
+        'max_tokens': max_tokens
+    }
+    if stream:
+        payload['stream'] = True
+    return payload
+
+def _headers(api_key: str) -> Dict[str, str]:
+    return {
+        'Content-Type': 'application/json',
+        'Authorization': f'Bearer {api_key}'
+    }
+
+def _error_detail(resp: httpx.Response) -> str:
+    try:
+        return f'Mistral API error: {resp.json().get("error", {}).get("message", "Unknown error")}'
+    except Exception:
+        return f'Mistral API error: {resp.status_code}'
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, MistralError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+async def complete(api_key: str, messages: List[Dict[str, str]], model: str = DEFAULT_MODEL,
+                   max_tokens: int = DEFAULT_MAX_TOKENS, timeout: float = 30.0) -> Dict[str, Any]:
+    """Run a chat completion and return {'content': str, 'usage': dict}.
+
+    `timeout` caps each attempt; rate limits, 5xx and connection errors are
+    retried while the request deadline allows.
+    """
+    async def attempt():
+        async with httpx.AsyncClient(timeout=timeout_for(timeout)) as client:
+            resp = await client.post(MISTRAL_API_URL, headers=_headers(api_key), json=_request(messages, model, max_tokens))
+        if resp.status_code != 200:
+            raise MistralError(resp.status_code, _error_detail(resp))
+        return resp
+
+    try:
+        resp = await retry_async(attempt, retryable=_retryable)
+    except httpx.TimeoutException:
+        raise MistralError(504, 'Mistral API timed out')
+    except httpx.TransportError as e:
+        raise MistralError(502, f'Could not reach Mistral API: {e.__class__.__name__}')
+    data = resp.json()
+    try:
+        return {'content': data['choices'][0]['message']['content'], 'usage': data.get('usage') or {}}
+    except Exception:
+        raise MistralError(500, 'Unexpected response format from Mistral AI')
+
+async def stream(api_key: str, messages: List[Dict[str, str]], model: str = DEFAULT_MODEL,
+                 max_tokens: int = DEFAULT_MAX_TOKENS, timeout: float = 30.0,
+                 usage: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """Yield completion text deltas as they arrive over server-sent events.
+
+    When `usage` is given it is filled in from the final chunk, if the API sends one.
+    """
+    try:
+        async with httpx.AsyncClient(timeout=timeout_for(timeout)) as client:
+            async with client.stream(
+                'POST', MISTRAL_API_URL, headers=_headers(api_key), json=_request(messages, model, max_tokens, stream=True)
+            ) as resp:
+                if resp.status_code != 200:
+                    await resp.aread()
+                    raise MistralError(resp.status_code, _error_detail(resp))
+                async for line in resp.aiter_lines():
+                    if not line.startswith('data:'):
+                        continue
+                    data = line[len('data:'):].strip()
+                    if data == '[DONE]':
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError:
+                        continue
+                    if usage is not None and chunk.get('usage'):
+                        usage.update(chunk['usage'])
+                    for choice in chunk.get('choices') or []:
+                        delta = (choice.get('delta') or {}).get('content')
+                        if delta:
+                            yield delta
+    except httpx.TimeoutException:
+        raise MistralError(504, 'Mistral API timed out')
+    except httpx.TransportError as e:
+        raise MistralError(502, f'Could not reach Mistral API: {e.__class__.__name__}')
@@ -0,0 +1,120 @@
+import os
+import json
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from stats import percentile
+
+# Tiers are tried in order; the first whose max_chars fits the prompt plus
+# context wins. Smaller models answer short questions several times faster.
+DEFAULT_ROUTING_TABLE = [
+    {"model": "mistral-small-latest", "max_chars": 500, "max_tokens": 1024},
+    {"model": "mistral-medium-latest", "max_chars": 4000, "max_tokens": 2048},
+    {"model": "mistral-large-latest", "max_chars": None, "max_tokens": 4000},
+]
+MAX_TOKENS_LIMIT = 8192
+
+def _load_routing_table() -> List[Dict[str, Any]]:
+    raw = os.getenv("MISTRAL_ROUTING_TABLE")
+    if not raw:
+        return DEFAULT_ROUTING_TABLE
+    try:
+        table = json.loads(raw)
+        if isinstance(table, list) and table and all("model" in tier for tier in table):
+            return table
+        print("MISTRAL_ROUTING_TABLE must be a non-empty JSON list of tiers, using defaults")
+    except ValueError as e:
+        print(f"Invalid MISTRAL_ROUTING_TABLE, using defaults: {str(e)}")
+    return DEFAULT_ROUTING_TABLE
+
+class ModelRouter:
+    """Pick a Mistral model and max_tokens per request and track per-model latency"""
+
+    def __init__(self):
+        self.enabled = os.getenv("MISTRAL_ROUTING_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.table = _load_routing_table()
+        self.latency_slo_ms = float(os.getenv("MISTRAL_LATENCY_SLO_MS", "8000"))
+        # Don't act on the SLO until a model has enough samples to judge it
+        self.min_samples = int(os.getenv("MISTRAL_ROUTING_MIN_SAMPLES", "20"))
+        self.window = int(os.getenv("MISTRAL_ROUTING_WINDOW", "200"))
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def _tier_for(self, size: int) -> int:
+        for index, tier in enumerate(self.table):
+            if tier.get("max_chars") is None or size <= tier["max_chars"]:
+                return index
+        return len(self.table) - 1
+
+    def _over_slo(self, model: str) -> bool:
+        samples = self.latencies.get(model)
+        if not samples or len(samples) < self.min_samples:
+            return False
+        return percentile(list(samples), 90) > self.latency_slo_ms
+
+    def choose(self, prompt_chars: int, context_chars: int = 0,
+               model: Optional[str] = None, max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """Routing decision: {'model', 'max_tokens', 'reason'}.
+
+        An explicit `model` / `max_tokens` always wins over the table.
+        """
+        if max_tokens is not None:
+            max_tokens = max(1, min(int(max_tokens), MAX_TOKENS_LIMIT))
+
+        if model:
+            tier = next((t for t in self.table if t["model"] == model), None)
+            return {
+                "model": model,
+                "max_tokens": max_tokens or (tier or self.table[-1])["max_tokens"],
+                "reason": "override"
+            }
+
+        if not self.enabled:
+            tier = self.table[-1]
+            return {"model": tier["model"], "max_tokens": max_tokens or tier["max_tokens"], "reason": "routing disabled"}
+
+        index = self._tier_for(prompt_chars + context_chars)
+        reason = "size"
+        # Step down to faster tiers while the chosen model is breaching the SLO
+        while index > 0 and self._over_slo(self.table[index]["model"]):
+            index -= 1
+            reason = "latency slo"
+        tier = self.table[index]
+        return {"model": tier["model"], "max_tokens": max_tokens or tier["max_tokens"], "reason": reason}
+
+    def choose_for_messages(self, messages: List[Dict[str, str]], model: Optional[str] = None,
+                            max_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """Route a chat payload: the last message is the prompt and every earlier
+        non-system message (conversation history) counts as context. The fixed
+        system prompt is left out, as the tier thresholds already allow for it.
+        """
+        prompt_chars = len(messages[-1].get("content") or "") if messages else 0
+        context_chars = sum(len(m.get("content") or "") for m in messages[:-1] if m.get("role") != "system")
+        return self.choose(prompt_chars, context_chars, model=model, max_tokens=max_tokens)
+
+    def record(self, model: str, latency_ms: float, ok: bool = True):
+        if not ok:
+            self.errors[model] = self.errors.get(model, 0) + 1
+            return
+        self.latencies.setdefault(model, deque(maxlen=self.window)).append(latency_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        models = {}
+        for model in set(self.latencies) | set(self.errors):
+            samples = list(self.latencies.get(model, []))
+            models[model] = {
+                "samples": len(samples),
+                "errors": self.errors.get(model, 0),
+                "p50_ms": percentile(samples, 50),
+                "p90_ms": percentile(samples, 90),
+                "p99_ms": percentile(samples, 99),
+                "over_slo": self._over_slo(model)
+            }
+        return {
+            "enabled": self.enabled,
+            "latency_slo_ms": self.latency_slo_ms,
+            "table": self.table,
+            "models": models
+        }
+
+# Global model router instance
+model_router = ModelRouter()
@@ -17,6 +17,8 @@ class Conversation(BaseModel):
     user_ids: Optional[List[str]] = []
     messages: Optional[List[Message]] = []
     created_at: Optional[datetime] = None
+    last_message: Optional[str] = None
+    message_count: Optional[int] = None
 
 class User(BaseModel):
     id: Optional[str] = Field(None, alias="_id")
@@ -35,11 +37,19 @@ class UserLogin(BaseModel):
     email: Optional[str] = None
     firebase_uid: Optional[str] = None
 
+class ChatTurnRequest(BaseModel):
+    message: str
+    stream: bool = False
+    model: Optional[str] = None
+    max_tokens: Optional[int] = None
+
 # MCP-related models
 class MCPMessageRequest(BaseModel):
     message: str
     context: Optional[Dict[str, Any]] = None
     conversation_id: Optional[str] = None
+    model: Optional[str] = None
+    max_tokens: Optional[int] = None
 
 class MCPToolCallRequest(BaseModel):
     tool_name: str
@@ -0,0 +1,179 @@
+import os
+import json
+import zlib
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List
+from bson import ObjectId
+from db import db, CONVERSATION_PROJECTION
+from message_store import message_store
+from conversation_counters import set_conversation_counters
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+# Lines longer than this are rejected instead of buffered without bound
+IMPORT_MAX_LINE_BYTES = int(os.getenv("IMPORT_MAX_LINE_BYTES", str(1024 * 1024)))
+IMPORT_DECOMPRESS_STEP_BYTES = 64 * 1024
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _dump_line(record: Dict[str, Any]) -> bytes:
+    return (json.dumps(record, default=_json_default, separators=(",", ":")) + "\n").encode("utf-8")
+
+def _parse_datetime(value):
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return None
+
+async def _export_lines(user_id: str) -> AsyncIterator[bytes]:
+    """Yield one NDJSON line per conversation, each followed by its messages"""
+    conversations = db.conversations.find(
+        {"user_id": user_id}, CONVERSATION_PROJECTION, batch_size=EXPORT_BATCH_SIZE
+    ).sort("created_at", 1)
+    async for conversation in conversations:
+        conversation.pop("_id", None)
+        yield _dump_line({"type": "conversation", **conversation})
+
+        conversation_id = conversation.get("conversation_id")
+        if not conversation_id:
+            continue
+        async for message in message_store.find(conversation_id, batch_size=EXPORT_BATCH_SIZE):
+            message = dict(message)
+            message["_id"] = str(message["_id"])
+            yield _dump_line({"type": "message", **message})
+
+async def export_ndjson(user_id: str, compress: bool = False) -> AsyncIterator[bytes]:
+    """Stream a user's conversations and messages as (optionally gzipped) NDJSON"""
+    if not compress:
+        async for line in _export_lines(user_id):
+            yield line
+        return
+
+    # wbits=31 writes a gzip header so the body is a valid .gz stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    pending = []
+    pending_size = 0
+    async for line in _export_lines(user_id):
+        pending.append(line)
+        pending_size += len(line)
+        if pending_size >= 64 * 1024:
+            chunk = compressor.compress(b"".join(pending))
+            pending, pending_size = [], 0
+            if chunk:
+                yield chunk
+    yield compressor.compress(b"".join(pending)) + compressor.flush()
+
+async def _iter_lines(chunks: AsyncIterator[bytes], gzipped: bool) -> AsyncIterator[bytes]:
+    # wbits=47 accepts both gzip and zlib headers
+    decompressor = zlib.decompressobj(47) if gzipped else None
+    buffer = b""
+
+    def split(data: bytes) -> List[bytes]:
+        nonlocal buffer
+        lines = (buffer + data).split(b"\n")
+        buffer = lines.pop()
+        if len(buffer) > IMPORT_MAX_LINE_BYTES:
+            raise ValueError("Import line exceeds maximum length")
+        return [line for line in lines if line.strip()]
+
+    async for chunk in chunks:
+        if not decompressor:
+            for line in split(chunk):
+                yield line
+            continue
+        # Inflate at most one step at a time, so a small, highly compressed
+        # body hits the line cap before it can fill memory
+        while chunk:
+            data = decompressor.decompress(chunk, IMPORT_DECOMPRESS_STEP_BYTES)
+            chunk = decompressor.unconsumed_tail
+            for line in split(data):
+                yield line
+    if decompressor:
+        for line in split(decompressor.flush()):
+            yield line
+    if buffer.strip():
+        yield buffer
+
+async def import_ndjson(user_id: str, chunks: AsyncIterator[bytes], gzipped: bool = False) -> Dict[str, int]:
+    """Import an NDJSON export for a user in bounded insert_many batches.
+
+    Conversations get fresh conversation ids so an import never collides with
+    existing data; messages are re-pointed at the new ids.
+    """
+    id_map: Dict[str, str] = {}
+    # new conversation id -> [message count, (timestamp, content) of the newest message]
+    counters: Dict[str, List[Any]] = {}
+    conversations: List[Dict[str, Any]] = []
+    messages: List[Dict[str, Any]] = []
+    stats = {"conversations": 0, "messages": 0, "skipped": 0}
+
+    async def flush():
+        # Conversations go first so a partially failed import never leaves
+        # messages pointing at a conversation that was not written
+        if conversations:
+            await db.conversations.insert_many(conversations, ordered=False)
+            stats["conversations"] += len(conversations)
+            conversations.clear()
+        if messages:
+            await message_store.insert_many(messages)
+            stats["messages"] += len(messages)
+            messages.clear()
+
+    async for line in _iter_lines(chunks, gzipped):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            stats["skipped"] += 1
+            continue
+        if not isinstance(record, dict):
+            stats["skipped"] += 1
+            continue
+
+        record_type = record.get("type")
+        if record_type == "conversation":
+            old_id = record.get("conversation_id")
+            new_id = str(uuid.uuid4())
+            if old_id:
+                id_map[old_id] = new_id
+            counters[new_id] = [0, None]
+            conversations.append({
+                "conversation_id": new_id,
+                "title": record.get("title", "New Chat"),
+                "user_id": user_id,
+                "user_ids": record.get("user_ids") or [],
+                "created_at": _parse_datetime(record.get("created_at")) or datetime.utcnow(),
+            })
+        elif record_type == "message" and record.get("conversation_id") in id_map:
+            message = {
+                # AI replies keep their "assistant" sender; everything else belongs to the importer
+                "user_id": "assistant" if record.get("user_id") == "assistant" else user_id,
+                "content": str(record.get("content", "")),
+                "timestamp": _parse_datetime(record.get("timestamp")) or datetime.utcnow(),
+                "conversation_id": id_map[record["conversation_id"]],
+            }
+            messages.append(message)
+            counter = counters[message["conversation_id"]]
+            counter[0] += 1
+            if counter[1] is None or message["timestamp"] >= counter[1][0]:
+                counter[1] = (message["timestamp"], message["content"])
+        else:
+            stats["skipped"] += 1
+            continue
+
+        if len(conversations) + len(messages) >= IMPORT_BATCH_SIZE:
+            await flush()
+
+    await flush()
+    # The conversation list reads denormalized counters, so fill them in
+    for conversation_id, (count, newest) in counters.items():
+        if count:
+            await set_conversation_counters(conversation_id, count, newest[1])
+    return stats
@@ -0,0 +1,95 @@
+import os
+from typing import Any, Dict, Optional
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+
+# Optional: brotli compression (pip install brotli-asgi) and MessagePack
+# bodies (pip install msgpack). Without them responses fall back to gzip / JSON.
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+# Responses on these paths may already be gzip files; the gzip middleware
+# skips application/gzip bodies, brotli does not
+BROTLI_EXCLUDED_PATHS = ("/export",)
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """Content codings listed in an Accept-Encoding header, mapped to their q-values"""
+    encodings = {}
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value.strip())
+                except ValueError:
+                    quality = 0.0
+        encodings[coding] = quality
+    return encodings
+
+def _quality(encodings: Dict[str, float], coding: str) -> float:
+    return encodings.get(coding, encodings.get("*", 0.0))
+
+def _accepting_only(scope, coding: str):
+    # The wrapped middlewares look for their coding's name in the header and
+    # ignore q-values, so hand them just the coding that was picked
+    headers = [(name, value) for name, value in scope["headers"] if name != b"accept-encoding"]
+    return {**scope, "headers": [*headers, (b"accept-encoding", coding.encode("latin-1"))]}
+
+class CompressionMiddleware:
+    """Compress responses above COMPRESSION_MIN_SIZE with brotli or gzip, per Accept-Encoding.
+
+    The coding with the higher q-value wins, brotli on a tie; codings with
+    q=0 are never used, and neither being acceptable sends the body as is.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=COMPRESSION_LEVEL)
+        self.brotli = None
+        if BrotliMiddleware is not None:
+            self.brotli = BrotliMiddleware(app, quality=4, minimum_size=minimum_size, gzip_fallback=False)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encodings = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        br, gzip = _quality(encodings, "br"), _quality(encodings, "gzip")
+        if self.brotli and br > 0 and br >= gzip and not scope["path"].startswith(BROTLI_EXCLUDED_PATHS):
+            await self.brotli(_accepting_only(scope, "br"), receive, send)
+        elif gzip > 0:
+            await self.gzip(_accepting_only(scope, "gzip"), receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+def wants_msgpack(request: Request) -> bool:
+    """True when msgpack is installed and the client asked for it in Accept"""
+    if msgpack is None:
+        return False
+    accept = request.headers.get("accept", "")
+    return any(media_type in accept for media_type in MSGPACK_MEDIA_TYPES)
+
+def msgpack_response(payload: Any, status_code: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(
+        content=msgpack.packb(jsonable_encoder(payload)),
+        status_code=status_code,
+        media_type=MSGPACK_MEDIA_TYPES[0],
+        headers={"Vary": "Accept", **(headers or {})}
+    )
@@ -1,15 +1,32 @@
-from fastapi import APIRouter, HTTPException, Depends, Request, status, Query
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, status, Query
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
-from models import Message, Conversation, User, MCPMessageRequest, MCPToolCallRequest, MCPContextRequest, MCPResponse, UserCreate, UserLogin
-from db import db
+from models import Message, Conversation, User, ChatTurnRequest, MCPMessageRequest, MCPToolCallRequest, MCPContextRequest, MCPResponse, UserCreate, UserLogin
+from db import db, causal_session, snapshot_session, HISTORY_READ_PREFERENCE, ANALYTICS_READ_PREFERENCE, USER_PROJECTION, OWNERSHIP_PROJECTION, CONVERSATION_VERSION_PROJECTION, CONVERSATION_PROJECTION, CONVERSATION_DETAILS_PROJECTION
 from bson import ObjectId
 import os
-import httpx
+import asyncio
+import time
+import zlib
+import mistral_client
 import jwt
+import json
 from fastapi.security import OAuth2PasswordBearer
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
 from mcp_integration import mcp_integration
 from firebase_config import firebase_config
+from ndjson_transfer import export_ndjson, import_ndjson
+from message_store import message_store
+from background_jobs import job_runner
+from model_routing import model_router
+from negotiation import wants_msgpack, msgpack_response
+from deadlines import DeadlineExceeded
+from idempotency import run_idempotent
+from etags import make_etag, is_not_modified, not_modified_response, bump_list_version
+from conversation_counters import message_preview, update_conversation_counters
+from usage_rollups import record_usage, query_usage, bucket_start, as_naive_utc, GRANULARITIES
 
 SECRET_KEY = os.getenv('JWT_SECRET')
 if not SECRET_KEY:
@@ -42,7 +59,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         raise credentials_exception
     
     # Get user data from MongoDB
-    user = await db.users.find_one({"uid": uid})
+    user = await db.users.find_one({"uid": uid}, USER_PROJECTION)
     if not user:
         # Fallback to Firebase if not in MongoDB
         firebase_user = firebase_config.get_user_by_uid(uid)
@@ -61,7 +78,9 @@ async def register(user_data: UserCreate):
         
         if not firebase_uid:
             # Fallback: create a Firebase user
-            firebase_result = firebase_config.create_user(
+            # Firebase is called with the blocking requests library; keep it off the event loop
+            firebase_result = await run_in_threadpool(
+                firebase_config.create_user,
                 email=user_data.email or f"{user_data.username}@chatnest.local",
                 password=user_data.password,
                 display_name=user_data.username
@@ -107,6 +126,22 @@ async def register(user_data: UserCreate):
         print(f"Registration error: {e}")
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
 
+async def sync_user_profile(uid: str, username: str, email: str):
+    """Insert or update a user document, skipping the write when nothing changed"""
+    existing = await db.users.find_one({"uid": uid}, USER_PROJECTION)
+    if existing and existing.get("username") == username and existing.get("email") == email:
+        return
+    
+    now = datetime.utcnow()
+    await db.users.update_one(
+        {"uid": uid},
+        {
+            "$set": {"uid": uid, "username": username, "email": email, "updated_at": now},
+            "$setOnInsert": {"created_at": now}
+        },
+        upsert=True
+    )
+
 @router.post("/login")
 async def login(user_data: UserLogin):
     """Login user"""
@@ -116,7 +151,8 @@ async def login(user_data: UserLogin):
         
         if not firebase_uid:
             # Fallback: verify user with Firebase
-            firebase_result = firebase_config.verify_user(
+            firebase_result = await run_in_threadpool(
+                firebase_config.verify_user,
                 email=user_data.email or f"{user_data.username}@chatnest.local",
                 password=user_data.password
             )
@@ -126,20 +162,15 @@ async def login(user_data: UserLogin):
             
             firebase_uid = firebase_result["uid"]
         
-        # Store or update user data in MongoDB
-        user_doc = {
-            "uid": firebase_uid,
-            "username": user_data.username,
-            "email": user_data.email or f"{user_data.username}@chatnest.local",
-            "updated_at": datetime.utcnow()
-        }
-        
-        # Insert or update user in MongoDB
-        await db.users.update_one(
-            {"uid": firebase_uid},
-            {"$set": user_doc},
-            upsert=True
-        )
+        # get_current_user reads this document on the next request, so a missing
+        # one is created inline; only profile changes are synced off the request path
+        username = user_data.username
+        email = user_data.email or f"{user_data.username}@chatnest.local"
+        existing = await db.users.find_one({"uid": firebase_uid}, USER_PROJECTION)
+        if not existing:
+            await sync_user_profile(firebase_uid, username, email)
+        elif existing.get("username") != username or existing.get("email") != email:
+            job_runner.enqueue(f"user:{firebase_uid}", sync_user_profile, firebase_uid, username, email)
         
         # Generate JWT token
         access_token = create_access_token(
@@ -177,72 +208,150 @@ def conversation_helper(conversation):
         "user_ids": conversation.get("user_ids", []),
         "messages": [],  # Messages will be loaded separately
         "created_at": conversation.get("created_at"),
-        "last_message": "",  # Will be updated by frontend
-        "message_count": 0   # Will be updated by frontend
+        "last_message": conversation.get("last_message", ""),  # Maintained on message writes
+        "message_count": conversation.get("message_count", 0)
     }
 
+def list_version(user) -> int:
+    """Conversation list version of a user; None for users without a MongoDB document"""
+    return user.get("list_version", 0) if "_id" in user else None
+
 @router.post("/messages/", response_model=Message)
-async def send_message(message: Message, user=Depends(get_current_user)):
-    data = message.dict(by_alias=True)
-    data["user_id"] = user.get("uid")  # Add current user ID
-    if not data.get("timestamp"):
-        data["timestamp"] = datetime.utcnow()
-    if data.get("_id") is None:
-        data.pop("_id")
-    result = await db.messages.insert_one(data)
-    data["_id"] = result.inserted_id
-    return message_helper(data)
+async def send_message(message: Message, request: Request, user=Depends(get_current_user)):
+    async def insert():
+        data = message.dict(by_alias=True)
+        data["user_id"] = user.get("uid")  # Add current user ID
+        if not data.get("timestamp"):
+            data["timestamp"] = datetime.utcnow()
+        if data.get("_id") is None:
+            data.pop("_id")
+        data = await message_store.insert(data)
+        await update_conversation_counters(data.get("conversation_id"), data["user_id"], 1, data["content"])
+        job_runner.enqueue(f"usage:{data['user_id']}", record_usage, data["user_id"], messages_sent=1, at=data["timestamp"])
+        return message_helper(data)
+    
+    # Retried POSTs carrying the same Idempotency-Key get the original message back
+    return await run_idempotent(request, user.get("uid"), message.dict(by_alias=True), insert)
 
 @router.get("/messages/{conversation_id}", response_model=List[Message])
-async def get_messages(conversation_id: str, user=Depends(get_current_user)):
+async def get_messages(conversation_id: str, request: Request, response: Response, user=Depends(get_current_user)):
     """Get messages for a specific conversation (only if user owns the conversation)"""
     user_id = user.get("uid")
     
-    # First check if the conversation belongs to the user
-    conversation = await db.conversations.find_one({"conversation_id": conversation_id, "user_id": user_id})
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found or access denied")
-    
-    messages = []
-    cursor = db.messages.find({"conversation_id": conversation_id}).sort("timestamp", 1)  # Sort by oldest first
-    async for doc in cursor:
-        messages.append(message_helper(doc))
+    async with causal_session() as session:
+        # First check if the conversation belongs to the user. This read goes to
+        # the primary, so message reads from a secondary in the same session
+        # wait until they include everything up to this version.
+        conversation = await db.conversations.find_one(
+            {"conversation_id": conversation_id, "user_id": user_id}, CONVERSATION_VERSION_PROJECTION, session=session
+        )
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found or access denied")
+        
+        # The version is read before the messages, so a concurrent write can only
+        # make the ETag older than the body and cause a refetch, never a stale 304
+        use_msgpack = wants_msgpack(request)
+        etag = make_etag(user_id, f"messages:{conversation_id}", conversation.get("version", 0), "msgpack" if use_msgpack else "json")
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+        
+        messages = []
+        async for doc in message_store.find(conversation_id, session=session, read_preference=HISTORY_READ_PREFERENCE):  # Oldest first
+            messages.append(message_helper(doc))
+    if use_msgpack:
+        return msgpack_response([m.dict(by_alias=True) for m in messages], headers={"ETag": etag})
+    response.headers["Vary"] = "Accept"
+    response.headers["ETag"] = etag
     return messages
 
 @router.post("/conversations/", response_model=Conversation)
-async def create_conversation(conversation: Conversation, user=Depends(get_current_user)):
-    data = conversation.dict(by_alias=True)
-    data["user_id"] = user.get("uid")  # Add current user ID
-    data["created_at"] = datetime.utcnow()
-    result = await db.conversations.insert_one(data)
-    data["_id"] = result.inserted_id
-    return conversation_helper(data)
+async def create_conversation(conversation: Conversation, request: Request, user=Depends(get_current_user)):
+    async def insert():
+        data = conversation.dict(by_alias=True)
+        data["user_id"] = user.get("uid")  # Add current user ID
+        data["created_at"] = datetime.utcnow()
+        result = await db.conversations.insert_one(data)
+        data["_id"] = result.inserted_id
+        await bump_list_version(data["user_id"])
+        return conversation_helper(data)
+    
+    return await run_idempotent(request, user.get("uid"), conversation.dict(by_alias=True), insert, response_model=Conversation)
 
 @router.get("/conversations/", response_model=List[Conversation])
-async def get_conversations(user=Depends(get_current_user)):
+async def get_conversations(request: Request, response: Response, user=Depends(get_current_user)):
     """Get all conversations for the current user"""
     conversations = []
     user_id = user.get("uid")
-    cursor = db.conversations.find({"user_id": user_id}).sort("created_at", -1)  # Sort by newest first
-    async for doc in cursor:
-        conversations.append(conversation_helper(doc))
+    
+    use_msgpack = wants_msgpack(request)
+    etag = make_etag(user_id, "conversations", list_version(user), "msgpack" if use_msgpack else "json")
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    
+    async with causal_session() as session:
+        if session is not None:
+            # A point read on the primary orders the list read after the
+            # list_version the ETag came from, even if it hits a secondary
+            await db.users.find_one({"uid": user_id}, OWNERSHIP_PROJECTION, session=session)
+        cursor = db.get_collection("conversations", read_preference=HISTORY_READ_PREFERENCE).find(
+            {"user_id": user_id}, CONVERSATION_PROJECTION, session=session
+        ).sort("created_at", -1)  # Sort by newest first
+        async for doc in cursor:
+            conversations.append(conversation_helper(doc))
+    headers = {"ETag": etag} if etag else {}
+    if use_msgpack:
+        return msgpack_response([Conversation(**c).dict(by_alias=True) for c in conversations], headers=headers)
+    response.headers["Vary"] = "Accept"
+    response.headers.update(headers)
     return conversations 
 
 @router.post("/conversations/new", response_model=Conversation)
-async def create_new_conversation(title: str = Query("New Chat", description="Title for the new conversation"), user=Depends(get_current_user)):
+async def create_new_conversation(request: Request, title: str = Query("New Chat", description="Title for the new conversation"), user=Depends(get_current_user)):
     """Create a new conversation for the current user"""
     import uuid
     
-    conversation_data = {
-        "conversation_id": str(uuid.uuid4()),
-        "title": title,
-        "user_id": user.get("uid"),
-        "created_at": datetime.utcnow()
-    }
+    async def insert():
+        conversation_data = {
+            "conversation_id": str(uuid.uuid4()),
+            "title": title,
+            "user_id": user.get("uid"),
+            "created_at": datetime.utcnow()
+        }
+        
+        result = await db.conversations.insert_one(conversation_data)
+        conversation_data["_id"] = result.inserted_id
+        await bump_list_version(conversation_data["user_id"])
+        return conversation_helper(conversation_data)
     
-    result = await db.conversations.insert_one(conversation_data)
-    conversation_data["_id"] = result.inserted_id
-    return conversation_helper(conversation_data) 
+    # A double-clicked "new chat" sent with one Idempotency-Key creates a single conversation
+    return await run_idempotent(request, user.get("uid"), {"title": title}, insert, response_model=Conversation)
+
+def fallback_response(message: str) -> str:
+    return f"I understand you said: '{message}'. This is a fallback response since the AI API key is not configured. Please set up your Mistral API key in the .env file for full AI functionality."
+
+async def routed_completion(api_key: str, messages: List[Dict[str, str]], route: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    """Run a completion with the routed model, feeding its latency back to the router"""
+    started = time.perf_counter()
+    try:
+        result = await mistral_client.complete(
+            api_key, messages, model=route["model"], max_tokens=route["max_tokens"], timeout=timeout
+        )
+    except mistral_client.MistralError:
+        model_router.record(route["model"], 0, ok=False)
+        raise
+    model_router.record(route["model"], (time.perf_counter() - started) * 1000)
+    return result
+
+def track_ai_usage(uid: str, started: float, usage: Dict[str, Any] = None):
+    """Queue an AI call, its latency since `started` and its token usage for the rollups"""
+    job_runner.enqueue(
+        f"usage:{uid}",
+        record_usage,
+        uid,
+        ai_calls=1,
+        ai_latency_ms=(time.perf_counter() - started) * 1000,
+        tokens=(usage or {}).get('total_tokens', 0)
+    )
 
 @router.post("/ai/generate")
 async def generate_ai_response(request: Request, body: dict, user=Depends(get_current_user)):
@@ -254,64 +363,140 @@ async def generate_ai_response(request: Request, body: dict, user=Depends(get_cu
         
         print(f"AI request from user {user.get('uid')}: {message[:50]}...")
         
-        mistral_api_key = os.getenv('MISTRAL_API_KEY')
-        if not mistral_api_key or mistral_api_key == "your-mistral-api-key":
+        mistral_api_key = mistral_client.get_api_key()
+        if not mistral_api_key:
             # Fallback response if no API key
             return {
-                'response': f"I understand you said: '{message}'. This is a fallback response since the AI API key is not configured. Please set up your Mistral API key in the .env file for full AI functionality.",
+                'response': fallback_response(message),
                 'fallback': True
             }
         
-        system_prompt = 'You are a helpful AI assistant. Provide responses that are appropriate in length and detail for what the user is asking. Be natural and comprehensive when needed, concise when appropriate.'
-        payload = {
-            'model': 'mistral-large-latest',
-            'messages': [
-                {'role': 'system', 'content': system_prompt},
-                {'role': 'user', 'content': message}
-            ],
-            'temperature': 0.7,
-            'max_tokens': 4000
-        }
+        messages = mistral_client.build_messages(message)
+        route = model_router.choose_for_messages(messages, model=body.get('model'), max_tokens=body.get('max_tokens'))
+        print(f"Making request to Mistral API ({route['model']}, {route['reason']})...")
+        started = time.perf_counter()
+        try:
+            result = await routed_completion(mistral_api_key, messages, route, timeout=30.0)
+        except mistral_client.MistralError as e:
+            print(f"AI API error: {e.detail}")
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
         
-        print("Making request to Mistral API...")
-        async with httpx.AsyncClient(timeout=30.0) as client:  # Increased timeout
-            resp = await client.post(
-                'https://api.mistral.ai/v1/chat/completions',
-                headers={
-                    'Content-Type': 'application/json',
-                    'Authorization': f'Bearer {mistral_api_key}'
-                },
-                json=payload
-            )
-            
-            print(f"Mistral API response status: {resp.status_code}")
-            
-            if resp.status_code != 200:
-                error_detail = f'Mistral API error: {resp.status_code}'
-                try:
-                    error_data = resp.json()
-                    error_detail = f'Mistral API error: {error_data.get("error", {}).get("message", "Unknown error")}'
-                except:
-                    pass
-                print(f"AI API error: {error_detail}")
-                raise HTTPException(status_code=resp.status_code, detail=error_detail)
-            
-            data = resp.json()
-            try:
-                ai_answer = data['choices'][0]['message']['content']
-                print(f"AI response generated successfully: {len(ai_answer)} characters")
-                return {'response': ai_answer}
-            except Exception as e:
-                print(f"Error parsing AI response: {e}")
-                print(f"Response data: {data}")
-                raise HTTPException(status_code=500, detail='Unexpected response format from Mistral AI')
+        ai_answer = result['content']
+        print(f"AI response generated successfully: {len(ai_answer)} characters")
+        track_ai_usage(user.get("uid"), started, result['usage'])
+        return {'response': ai_answer, 'model': route['model']}
                 
-    except HTTPException:
+    except (HTTPException, DeadlineExceeded):
         raise
     except Exception as e:
         print(f"Unexpected error in AI generation: {e}")
         raise HTTPException(status_code=500, detail=f'AI generation failed: {str(e)}')
 
+@router.post("/conversations/{conversation_id}/turn")
+async def chat_turn(conversation_id: str, body: ChatTurnRequest, user=Depends(get_current_user)):
+    """Run one chat turn server-side: store the user message, generate a reply and store it.
+
+    With `stream` set, the reply is sent as NDJSON events while it is generated:
+    `{"type": "delta", "content": ...}` chunks followed by a final
+    `{"type": "done", "user_message": ..., "reply": ...}` event.
+    """
+    if not body.message:
+        raise HTTPException(status_code=400, detail='Message is required')
+    
+    user_id = user.get("uid")
+    conversation = await db.conversations.find_one({"conversation_id": conversation_id, "user_id": user_id}, OWNERSHIP_PROJECTION)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found or access denied")
+    
+    user_message = {
+        "user_id": user_id,
+        "content": body.message,
+        "timestamp": datetime.utcnow(),
+        "conversation_id": conversation_id
+    }
+    mistral_api_key = mistral_client.get_api_key()
+    history = []
+    if mistral_api_key:
+        # The model sees the recent conversation, and routing counts it as context
+        history = mistral_client.history_messages(
+            await message_store.recent(conversation_id, mistral_client.CHAT_HISTORY_MESSAGES)
+        )
+    messages = mistral_client.build_messages(body.message, history)
+    route = model_router.choose_for_messages(messages, model=body.model, max_tokens=body.max_tokens)
+    
+    async def persist(reply_content: str = None):
+        """Write the turn's messages in one batch and update the conversation counters"""
+        batch = [user_message]
+        if reply_content is not None:
+            batch.append({
+                "user_id": "assistant",
+                "content": reply_content,
+                "timestamp": datetime.utcnow(),
+                "conversation_id": conversation_id
+            })
+        await message_store.insert_many(batch)
+        await update_conversation_counters(conversation_id, user_id, len(batch), batch[-1]["content"])
+        job_runner.enqueue(f"usage:{user_id}", record_usage, user_id, messages_sent=1, at=user_message["timestamp"])
+        return [message_helper(m).dict(by_alias=True) for m in batch]
+    
+    if not body.stream:
+        if not mistral_api_key:
+            user_saved, reply_saved = await persist(fallback_response(body.message))
+            return {"user_message": user_saved, "reply": reply_saved, "fallback": True}
+        
+        started = time.perf_counter()
+        try:
+            result = await routed_completion(mistral_api_key, messages, route, timeout=30.0)
+        except mistral_client.MistralError as e:
+            # Keep the user's message even when generation fails
+            await persist()
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        
+        track_ai_usage(user_id, started, result['usage'])
+        user_saved, reply_saved = await persist(result['content'])
+        return {"user_message": user_saved, "reply": reply_saved, "model": route["model"]}
+    
+    def event(payload: Dict[str, Any]) -> bytes:
+        return (json.dumps(jsonable_encoder(payload)) + "\n").encode("utf-8")
+    
+    async def stream_turn():
+        if not mistral_api_key:
+            reply = fallback_response(body.message)
+            yield event({"type": "delta", "content": reply})
+            user_saved, reply_saved = await asyncio.shield(persist(reply))
+            yield event({"type": "done", "user_message": user_saved, "reply": reply_saved, "fallback": True})
+            return
+        
+        started = time.perf_counter()
+        usage: Dict[str, Any] = {}
+        parts: List[str] = []
+        try:
+            async for delta in mistral_client.stream(
+                mistral_api_key, messages, model=route["model"], max_tokens=route["max_tokens"], timeout=30.0, usage=usage
+            ):
+                parts.append(delta)
+                yield event({"type": "delta", "content": delta})
+        except Exception as e:
+            print(f"Streaming AI error: {e}")
+            model_router.record(route["model"], 0, ok=False)
+            (user_saved,) = await asyncio.shield(persist())
+            yield event({"type": "error", "detail": getattr(e, "detail", str(e)), "user_message": user_saved})
+            return
+        except BaseException:
+            # The client disconnected mid-stream (cancellation or generator
+            # close): keep the user's message. Every persist() in this
+            # generator is shielded so a disconnect can't cut a write short.
+            await asyncio.shield(persist())
+            raise
+        
+        # Full generation time, so streamed and non-streamed samples compare
+        model_router.record(route["model"], (time.perf_counter() - started) * 1000)
+        track_ai_usage(user_id, started, usage)
+        user_saved, reply_saved = await asyncio.shield(persist("".join(parts)))
+        yield event({"type": "done", "user_message": user_saved, "reply": reply_saved, "model": route["model"]})
+    
+    return StreamingResponse(stream_turn(), media_type="application/x-ndjson")
+
 # MCP Integration Endpoints
 @router.post("/mcp/initialize", response_model=Dict[str, Any])
 async def initialize_mcp(user=Depends(get_current_user)):
@@ -361,6 +546,11 @@ async def call_mcp_tool(request: MCPToolCallRequest, user=Depends(get_current_us
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"MCP tool call error: {str(e)}")
 
+async def deliver_mcp_context(context_data: Dict[str, Any]):
+    if not await mcp_integration.send_context(context_data):
+        # Raise so the job runner retries the delivery
+        raise RuntimeError("MCP server did not acknowledge context")
+
 @router.post("/mcp/context", response_model=Dict[str, Any])
 async def send_mcp_context(request: MCPContextRequest, user=Depends(get_current_user)):
     """Send context data to MCP server"""
@@ -369,10 +559,12 @@ async def send_mcp_context(request: MCPContextRequest, user=Depends(get_current_
         context_data = request.context_data.copy()
         context_data["user_id"] = user.get("username", user.get("uid"))
         
-        success = await mcp_integration.send_context(context_data)
+        # The MCP acknowledgement is not needed to answer the client
+        queued = job_runner.enqueue(f"mcp-context:{user.get('uid')}", deliver_mcp_context, context_data)
         return {
-            "success": success,
-            "message": "Context sent successfully" if success else "Failed to send context"
+            "success": queued,
+            "queued": queued,
+            "message": "Context queued for delivery" if queued else "Failed to queue context"
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"MCP context error: {str(e)}")
@@ -404,8 +596,10 @@ async def generate_enhanced_ai_response(request: MCPMessageRequest, user=Depends
                 "source": "chatnest"
             })
             
+            started = time.perf_counter()
             mcp_result = await mcp_integration.send_message(message, context)
             if mcp_result["success"]:
+                track_ai_usage(user.get("uid"), started)
                 return {
                     "response": mcp_result["response"],
                     "source": "mcp",
@@ -419,80 +613,68 @@ async def generate_enhanced_ai_response(request: MCPMessageRequest, user=Depends
     if not mistral_api_key:
         raise HTTPException(status_code=500, detail='No AI service configured')
     
-    system_prompt = 'You are a helpful AI assistant. Provide responses that are appropriate in length and detail for what the user is asking. Be natural and comprehensive when needed, concise when appropriate.'
-    payload = {
-        'model': 'mistral-large-latest',
-        'messages': [
-            {'role': 'system', 'content': system_prompt},
-            {'role': 'user', 'content': message}
-        ],
-        'temperature': 0.7,
-        'max_tokens': 4000
-    }
+    messages = mistral_client.build_messages(message)
+    route = model_router.choose_for_messages(messages, model=request.model, max_tokens=request.max_tokens)
+    started = time.perf_counter()
+    try:
+        result = await routed_completion(mistral_api_key, messages, route, timeout=10)
+    except mistral_client.MistralError as e:
+        detail = 'Mistral API error' if e.detail.startswith('Mistral API error') else e.detail
+        raise HTTPException(status_code=e.status_code, detail=detail)
     
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.post(
-            'https://api.mistral.ai/v1/chat/completions',
-            headers={
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {mistral_api_key}'
-            },
-            json=payload
-        )
-        if resp.status_code != 200:
-            raise HTTPException(status_code=resp.status_code, detail='Mistral API error')
-        data = resp.json()
-        try:
-            ai_answer = data['choices'][0]['message']['content']
-            return {
-                'response': ai_answer,
-                'source': 'mistral',
-                'timestamp': datetime.utcnow().isoformat()
-            }
-        except Exception:
-            raise HTTPException(status_code=500, detail='Unexpected response format from Mistral AI') 
+    track_ai_usage(user.get("uid"), started, result['usage'])
+    return {
+        'response': result['content'],
+        'source': 'mistral',
+        'model': route['model'],
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
+@router.get("/ai/routing", response_model=Dict[str, Any])
+async def get_ai_routing(user=Depends(get_current_user)):
+    """Get the model routing table and observed per-model latency"""
+    return model_router.stats()
 
 @router.get("/conversations/stats", response_model=Dict[str, Any])
 async def get_conversation_stats(user=Depends(get_current_user)):
     """Get conversation statistics for the current user"""
     user_id = user.get("uid")
+    # Stats tolerate replication lag, so they are read from secondaries. With
+    # snapshot reads enabled all four queries see the same point in time.
+    conversations = db.get_collection("conversations", read_preference=ANALYTICS_READ_PREFERENCE)
     
-    # Get total conversations
-    total_conversations = await db.conversations.count_documents({"user_id": user_id})
-    
-    # Get total messages
-    total_messages = await db.messages.count_documents({"user_id": user_id})
-    
-    # Get recent conversations (last 7 days)
-    from datetime import datetime, timedelta
-    week_ago = datetime.utcnow() - timedelta(days=7)
-    recent_conversations = await db.conversations.count_documents({
-        "user_id": user_id,
-        "created_at": {"$gte": week_ago}
-    })
-    
-    # Get most active conversation
-    pipeline = [
-        {"$match": {"user_id": user_id}},
-        {"$lookup": {
-            "from": "messages",
-            "localField": "conversation_id",
-            "foreignField": "conversation_id",
-            "as": "message_count"
-        }},
-        {"$addFields": {"message_count": {"$size": "$message_count"}}},
-        {"$sort": {"message_count": -1}},
-        {"$limit": 1}
-    ]
-    
-    most_active = None
-    async for doc in db.conversations.aggregate(pipeline):
-        most_active = {
-            "conversation_id": doc.get("conversation_id"),
-            "title": doc.get("title", "Untitled"),
-            "message_count": doc.get("message_count", 0)
-        }
-        break
+    async with snapshot_session() as session:
+        # Get total conversations
+        total_conversations = await conversations.count_documents({"user_id": user_id}, session=session)
+        
+        # Get total messages
+        total_messages = await message_store.count_for_user(user_id, session=session, read_preference=ANALYTICS_READ_PREFERENCE)
+        
+        # Get recent conversations (last 7 days)
+        from datetime import datetime, timedelta
+        week_ago = datetime.utcnow() - timedelta(days=7)
+        recent_conversations = await conversations.count_documents({
+            "user_id": user_id,
+            "created_at": {"$gte": week_ago}
+        }, session=session)
+        
+        # Get most active conversation
+        pipeline = [
+            {"$match": {"user_id": user_id}},
+            {"$project": {"_id": 0, "conversation_id": 1, "title": 1}},
+            *message_store.count_lookup_stages(),
+            {"$sort": {"message_count": -1}},
+            {"$limit": 1}
+        ]
+        
+        most_active = None
+        async for doc in conversations.aggregate(pipeline, session=session):
+            most_active = {
+                "conversation_id": doc.get("conversation_id"),
+                "title": doc.get("title", "Untitled"),
+                "message_count": doc.get("message_count", 0)
+            }
+            break
     
     return {
         "total_conversations": total_conversations,
@@ -502,27 +684,35 @@ async def get_conversation_stats(user=Depends(get_current_user)):
     } 
 
 @router.get("/conversations/{conversation_id}/details", response_model=Dict[str, Any])
-async def get_conversation_details(conversation_id: str, user=Depends(get_current_user)):
+async def get_conversation_details(conversation_id: str, request: Request, response: Response, user=Depends(get_current_user)):
     """Get conversation details including message count and last message"""
     user_id = user.get("uid")
     
-    # Check if conversation belongs to user
-    conversation = await db.conversations.find_one({"conversation_id": conversation_id, "user_id": user_id})
-    if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found or access denied")
-    
-    # Get message count and last message
-    message_count = await db.messages.count_documents({"conversation_id": conversation_id})
-    last_message = ""
-    
-    if message_count > 0:
-        # Get the most recent message
-        last_message_doc = await db.messages.find_one(
-            {"conversation_id": conversation_id},
-            sort=[("timestamp", -1)]
+    async with causal_session() as session:
+        # Check if conversation belongs to user (on the primary, see get_messages)
+        conversation = await db.conversations.find_one(
+            {"conversation_id": conversation_id, "user_id": user_id}, CONVERSATION_DETAILS_PROJECTION, session=session
         )
-        if last_message_doc:
-            last_message = last_message_doc.get("content", "")[:100] + "..." if len(last_message_doc.get("content", "")) > 100 else last_message_doc.get("content", "")
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found or access denied")
+        
+        etag = make_etag(user_id, f"details:{conversation_id}", conversation.get("version", 0))
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+        response.headers["ETag"] = etag
+        
+        # Get message count and last message
+        message_count = await message_store.count(conversation_id, session=session, read_preference=HISTORY_READ_PREFERENCE)
+        last_message = ""
+        
+        if message_count > 0:
+            # Get the most recent message, letting the server cut the content down
+            # to one character past the preview length so we can tell it was longer
+            content = await message_store.last_content(
+                conversation_id, 101, session=session, read_preference=HISTORY_READ_PREFERENCE
+            )
+            if content:
+                last_message = message_preview(content)
     
     return {
         "conversation_id": conversation_id,
@@ -530,4 +720,55 @@ async def get_conversation_details(conversation_id: str, user=Depends(get_curren
         "message_count": message_count,
         "last_message": last_message,
         "created_at": conversation.get("created_at")
-    } 
\ No newline at end of file
+    }
+
+@router.get("/export")
+async def export_conversations(gzip: bool = Query(False, description="Gzip-compress the NDJSON stream"), user=Depends(get_current_user)):
+    """Stream all conversations and messages of the current user as NDJSON"""
+    filename = "chatnest-export.ndjson.gz" if gzip else "chatnest-export.ndjson"
+    return StreamingResponse(
+        export_ndjson(user.get("uid"), compress=gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.post("/import", response_model=Dict[str, int])
+async def import_conversations(request: Request, user=Depends(get_current_user)):
+    """Import an NDJSON export (optionally gzipped) into the current user's account"""
+    gzipped = (
+        request.headers.get("content-encoding", "").lower() == "gzip"
+        or request.headers.get("content-type", "").startswith("application/gzip")
+    )
+    try:
+        stats = await import_ndjson(user.get("uid"), request.stream(), gzipped=gzipped)
+    except (ValueError, zlib.error) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid import stream: {str(e)}")
+    finally:
+        # Batches may have been written even if the stream failed part way
+        await bump_list_version(user.get("uid"))
+    return stats
+
+@router.get("/analytics/usage", response_model=Dict[str, Any])
+async def get_usage(
+    granularity: str = Query("day", description="hour, day or week"),
+    start: datetime = Query(None, description="Range start (UTC, inclusive)"),
+    end: datetime = Query(None, description="Range end (UTC, exclusive)"),
+    user=Depends(get_current_user)
+):
+    """Get activity for the current user from the pre-aggregated usage rollups"""
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    
+    default_span = {"hour": timedelta(days=1), "day": timedelta(days=30), "week": timedelta(weeks=12)}
+    # Rollups are keyed by naive UTC; "...Z" or "+02:00" query values are aware
+    end = as_naive_utc(end) or datetime.utcnow()
+    start = as_naive_utc(start) or bucket_start(end - default_span[granularity], granularity)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    
+    return {
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        "series": await query_usage(user.get("uid"), granularity, start, end)
+    }
@@ -0,0 +1,9 @@
+from typing import List, Optional
+
+def percentile(samples: List[float], percentile: float) -> Optional[float]:
+    """Nearest-rank percentile of `samples`, rounded to 2 decimals; None when empty"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percentile / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 2)
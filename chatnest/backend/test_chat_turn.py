@@ -0,0 +1,55 @@
+import asyncio
+import httpx
+import pytest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import mistral_client
+import routes
+from model_routing import ModelRouter
+from models import ChatTurnRequest
+
+@pytest.fixture
+def conversation(mock_db, monkeypatch):
+    monkeypatch.setattr(mistral_client, "get_api_key", lambda: "key")
+    monkeypatch.setattr(routes, "model_router", ModelRouter())
+    asyncio.run(mock_db.conversations.insert_one({"conversation_id": "c1", "user_id": "u1"}))
+    return mock_db
+
+def unreachable(monkeypatch):
+    async def post(self, *args, **kwargs):
+        raise httpx.ConnectError("connection refused")
+    monkeypatch.setattr(httpx.AsyncClient, "post", post)
+
+def test_complete_maps_transport_errors(monkeypatch):
+    unreachable(monkeypatch)
+    with pytest.raises(mistral_client.MistralError) as error:
+        asyncio.run(mistral_client.complete("key", mistral_client.build_messages("hi")))
+    assert error.value.status_code == 502
+
+def test_chat_turn_keeps_the_message_when_mistral_is_unreachable(conversation, monkeypatch):
+    unreachable(monkeypatch)
+    app = FastAPI()
+    app.include_router(routes.router)
+    app.dependency_overrides[routes.get_current_user] = lambda: {"uid": "u1"}
+    response = TestClient(app).post("/conversations/c1/turn", json={"message": "hello"})
+
+    assert response.status_code == 502
+    assert [m["content"] for m in asyncio.run(routes.message_store.recent("c1", 10))] == ["hello"]
+    assert routes.model_router.stats()["models"]["mistral-small-latest"]["errors"] == 1
+
+def test_stream_disconnect_keeps_the_message(conversation, monkeypatch):
+    async def stream(*args, **kwargs):
+        while True:
+            yield "token "
+            await asyncio.sleep(0)
+    monkeypatch.setattr(mistral_client, "stream", stream)
+
+    async def scenario():
+        response = await routes.chat_turn("c1", ChatTurnRequest(message="hello", stream=True), user={"uid": "u1"})
+        chunks = response.body_iterator
+        await chunks.__anext__()
+        await chunks.aclose()  # what the server does when the client goes away
+        return await routes.message_store.recent("c1", 10)
+
+    assert [m["content"] for m in asyncio.run(scenario())] == ["hello"]
@@ -0,0 +1,56 @@
+import asyncio
+import json
+import pytest
+
+import conversation_counters
+import ndjson_transfer
+from conversation_counters import message_preview, update_conversation_counters
+
+def test_message_preview():
+    assert message_preview("hi") == "hi"
+    assert message_preview("x" * 101) == "x" * 100 + "..."
+
+def test_import_sets_counters(mock_db):
+    export = [
+        {"type": "conversation", "conversation_id": "old", "title": "t"},
+        *[{"type": "message", "conversation_id": "old", "user_id": "u1", "content": f"m{i}",
+           "timestamp": f"2026-01-01T00:00:0{i}"} for i in range(1, 6)],
+        {"type": "conversation", "conversation_id": "empty", "title": "e"},
+    ]
+
+    async def chunks():
+        yield "".join(json.dumps(record) + "\n" for record in export).encode()
+
+    async def scenario():
+        stats = await ndjson_transfer.import_ndjson("u2", chunks())
+        conversations = {c["title"]: c async for c in mock_db.conversations.find({"user_id": "u2"})}
+        return stats, conversations
+
+    stats, conversations = asyncio.run(scenario())
+    assert stats["messages"] == 5
+    assert conversations["t"]["message_count"] == 5
+    assert conversations["t"]["last_message"] == "m5"
+    assert conversations["e"].get("message_count", 0) == 0
+
+def test_update_counters_increments(mock_db):
+    async def scenario():
+        await mock_db.conversations.insert_one({"conversation_id": "c1", "user_id": "u1", "message_count": 3})
+        await update_conversation_counters("c1", "u1", 2, "latest")
+        return await mock_db.conversations.find_one({"conversation_id": "c1"})
+
+    conversation = asyncio.run(scenario())
+    assert conversation["message_count"] == 5
+    assert conversation["last_message"] == "latest"
+    assert conversation["version"] == 1
+
+def test_recount_conversation(mock_db):
+    async def scenario():
+        await mock_db.conversations.insert_one({"conversation_id": "c1", "user_id": "u1", "message_count": 1, "last_message": "x"})
+        count = await conversation_counters.recount_conversation("c1")
+        return count, await mock_db.conversations.find_one({"conversation_id": "c1"})
+
+    count, conversation = asyncio.run(scenario())
+    assert count == 0
+    assert conversation["message_count"] == 0
+    assert conversation["last_message"] == ""
+    assert conversation["version"] == 1
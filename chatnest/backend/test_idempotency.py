@@ -0,0 +1,79 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+
+from fastapi import HTTPException, Request
+import idempotency
+from idempotency import run_idempotent
+
+def make_request(key="k1"):
+    return Request({
+        "type": "http",
+        "method": "POST",
+        "path": "/messages/",
+        "query_string": b"",
+        "headers": [(b"idempotency-key", key.encode())],
+    })
+
+@pytest.fixture(autouse=True)
+def indexes(mock_db):
+    asyncio.run(idempotency.ensure_indexes())
+
+def test_cancelled_request_releases_the_key(mock_db):
+    async def cancelled():
+        raise asyncio.CancelledError()
+
+    async def ok():
+        return {"id": 1}
+
+    async def scenario():
+        with pytest.raises(asyncio.CancelledError):
+            await run_idempotent(make_request(), "u1", {"a": 1}, cancelled)
+        assert await mock_db.idempotency_keys.count_documents({}) == 0
+        return await run_idempotent(make_request(), "u1", {"a": 1}, ok)
+
+    assert asyncio.run(scenario()) == {"id": 1}
+
+def test_expired_pending_key_is_taken_over(mock_db):
+    calls = []
+
+    async def handler():
+        calls.append(1)
+        return {"id": len(calls)}
+
+    async def scenario():
+        first = make_request()
+        fingerprint = idempotency._fingerprint(first, {"a": 1})
+        await mock_db.idempotency_keys.insert_one({
+            "user_id": "u1",
+            "key": "k1",
+            "fingerprint": fingerprint,
+            "status": "pending",
+            "locked_until": datetime.utcnow() - timedelta(seconds=1),
+            "created_at": datetime.utcnow() - timedelta(minutes=5)
+        })
+        result = await run_idempotent(first, "u1", {"a": 1}, handler)
+        replay = await run_idempotent(make_request(), "u1", {"a": 1}, handler)
+        record = await mock_db.idempotency_keys.find_one({"user_id": "u1", "key": "k1"})
+        return result, replay, record
+
+    result, replay, record = asyncio.run(scenario())
+    assert result == {"id": 1}
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert record["status"] == "completed"
+    assert calls == [1]
+
+def test_locked_pending_key_gets_409(mock_db):
+    async def slow():
+        await asyncio.sleep(0.05)
+        return {"id": 1}
+
+    async def scenario():
+        first = asyncio.create_task(run_idempotent(make_request(), "u1", {"a": 1}, slow))
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as retry:
+            await run_idempotent(make_request(), "u1", {"a": 1}, slow)
+        assert await first == {"id": 1}
+        return retry.value.status_code
+
+    assert asyncio.run(scenario()) == 409
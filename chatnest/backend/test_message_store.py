@@ -0,0 +1,88 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+
+from message_store import BucketMessageStore
+
+@pytest.fixture
+def store(mock_db):
+    return BucketMessageStore(bucket_size=4)
+
+def message(index):
+    return {
+        "conversation_id": "c1",
+        "user_id": "u1",
+        "content": f"m{index}",
+        "timestamp": datetime(2026, 1, 1) + timedelta(seconds=index),
+    }
+
+async def contents(store):
+    return [m["content"] async for m in store.find("c1")]
+
+def test_bucket_mixed_single_and_batched_inserts(store):
+    async def scenario():
+        for i in (1, 2, 3):
+            await store.insert(message(i))
+        await store.insert_many([message(4), message(5)])  # a chat turn
+        await store.insert(message(6))
+        await store.insert_many([message(i) for i in range(7, 17)])
+        await store.insert(message(17))
+        return await contents(store), await store.count("c1"), await store.collection.count_documents(
+            {"conversation_id": "c1", "count": {"$lt": store.bucket_size}}
+        )
+
+    history, count, open_buckets = asyncio.run(scenario())
+    assert history == [f"m{i}" for i in range(1, 18)]
+    assert count == 17
+    assert open_buckets == 1
+
+def test_bucket_batch_into_empty_conversation(store):
+    async def scenario():
+        await store.insert_many([message(i) for i in range(1, 7)])
+        await store.insert(message(7))
+        return await contents(store)
+
+    assert asyncio.run(scenario()) == [f"m{i}" for i in range(1, 8)]
+
+def test_bucket_writers_racing_for_a_new_bucket_collide(store):
+    # A writer that saw no bucket (or a full one) must not start a second open bucket
+    real_last_bucket = store.last_bucket
+    stale = [None]
+
+    async def last_bucket(conversation_id):
+        if stale:
+            return stale.pop()
+        return await real_last_bucket(conversation_id)
+
+    async def scenario():
+        await store.insert(message(1))
+        store.last_bucket = last_bucket
+        await store.insert(message(2))
+        buckets = [b async for b in store.collection.find({"conversation_id": "c1"})]
+        return buckets, await contents(store)
+
+    buckets, history = asyncio.run(scenario())
+    assert [(b["_id"], b["count"]) for b in buckets] == [("c1:0", 2)]
+    assert history == ["m1", "m2"]
+
+def test_bucket_append_with_stale_count_retries(store):
+    real_last_bucket = store.last_bucket
+    stale = []
+
+    async def last_bucket(conversation_id):
+        if stale:
+            return stale.pop()
+        return await real_last_bucket(conversation_id)
+
+    async def scenario():
+        await store.insert_many([message(1), message(2), message(3)])
+        stale.append(await real_last_bucket("c1"))
+        await store.insert(message(4))  # fills bucket 0 behind the stale view
+        store.last_bucket = last_bucket
+        await store.insert(message(5))
+        buckets = [(b["seq"], b["count"]) async for b in store.collection.find({"conversation_id": "c1"}).sort("seq", 1)]
+        return buckets, await contents(store)
+
+    buckets, history = asyncio.run(scenario())
+    assert buckets == [(0, 4), (1, 1)]
+    assert history == [f"m{i}" for i in range(1, 6)]
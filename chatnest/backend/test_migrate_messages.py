@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+
+from message_store import BucketMessageStore
+from migrate_messages import migrate_conversation
+
+def message(index):
+    return {
+        "conversation_id": "c1",
+        "user_id": "u1",
+        "content": f"m{index}",
+        "timestamp": datetime(2026, 1, 1) + timedelta(seconds=index),
+    }
+
+@pytest.fixture
+def store(mock_db):
+    return BucketMessageStore(bucket_size=4)
+
+async def contents(store):
+    return [m["content"] async for m in store.find("c1")]
+
+def test_rerun_after_crash_copies_the_rest(mock_db, store):
+    async def scenario():
+        source = [message(i) for i in range(1, 11)]
+        await mock_db.messages.insert_many(source)
+        # An earlier run crashed after copying the first five messages
+        await store.insert_many([dict(m) for m in source[:5]])
+        copied = await migrate_conversation(store, "c1", dry_run=False)
+        again = await migrate_conversation(store, "c1", dry_run=False)
+        return copied, again, await contents(store)
+
+    copied, again, history = asyncio.run(scenario())
+    assert (copied, again) == (5, 0)
+    assert history == [f"m{i}" for i in range(1, 11)]
+
+def test_history_older_than_live_bucket_writes_is_prepended(mock_db, store):
+    async def scenario():
+        await mock_db.messages.insert_many([message(i) for i in range(1, 7)])
+        # Written after MESSAGE_STORAGE_LAYOUT was switched to bucket
+        for i in (7, 8, 9):
+            await store.insert(message(i))
+        copied = await migrate_conversation(store, "c1", dry_run=False)
+        again = await migrate_conversation(store, "c1", dry_run=False)
+        seqs = [(b["seq"], b["count"]) async for b in store.collection.find({"conversation_id": "c1"}).sort("seq", 1)]
+        return copied, again, seqs, await contents(store)
+
+    copied, again, seqs, history = asyncio.run(scenario())
+    assert (copied, again) == (6, 0)
+    assert history == [f"m{i}" for i in range(1, 10)]
+    assert seqs == [(-2, 2), (-1, 4), (0, 3)]
+    # New messages still append to the last bucket
+    asyncio.run(store.insert(message(10)))
+    assert asyncio.run(contents(store))[-1] == "m10"
+
+def test_dry_run_writes_nothing(mock_db, store):
+    async def scenario():
+        await mock_db.messages.insert_many([message(i) for i in range(1, 4)])
+        copied = await migrate_conversation(store, "c1", dry_run=True)
+        return copied, await store.collection.count_documents({})
+
+    assert asyncio.run(scenario()) == (3, 0)
@@ -0,0 +1,64 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import mistral_client
+import routes
+from message_store import BucketMessageStore, DocumentMessageStore
+from model_routing import ModelRouter
+
+def stored(index, content, user_id="u1"):
+    return {
+        "conversation_id": "c1",
+        "user_id": user_id,
+        "content": content,
+        "timestamp": datetime(2026, 1, 1) + timedelta(seconds=index),
+    }
+
+def test_history_messages_keeps_the_newest_within_budget():
+    history = mistral_client.history_messages(
+        [stored(1, "a" * 10), stored(2, "b" * 10, "assistant"), stored(3, "c" * 10)], max_chars=25
+    )
+    assert history == [{"role": "assistant", "content": "b" * 10}, {"role": "user", "content": "c" * 10}]
+
+def test_long_history_moves_the_request_up_a_tier():
+    router = ModelRouter()
+    history = mistral_client.history_messages([stored(i, "x" * 1000) for i in range(3)])
+    alone = router.choose_for_messages(mistral_client.build_messages("short question"))
+    with_history = router.choose_for_messages(mistral_client.build_messages("short question", history))
+    assert alone["model"] == "mistral-small-latest"
+    assert with_history["model"] == "mistral-medium-latest"
+
+@pytest.mark.parametrize("store", [DocumentMessageStore(), BucketMessageStore(bucket_size=4)])
+def test_recent_returns_the_newest_messages_oldest_first(mock_db, store):
+    async def scenario():
+        await store.insert_many([stored(i, f"m{i}") for i in range(1, 11)])
+        return await store.recent("c1", 5), await store.recent("c1", 0)
+
+    recent, none = asyncio.run(scenario())
+    assert [m["content"] for m in recent] == [f"m{i}" for i in range(6, 11)]
+    assert none == []
+
+def test_chat_turn_sends_and_routes_on_history(mock_db, monkeypatch):
+    sent = {}
+
+    async def routed_completion(api_key, messages, route, timeout):
+        sent.update(messages=messages, route=route)
+        return {"content": "reply", "usage": {}}
+
+    monkeypatch.setattr(mistral_client, "get_api_key", lambda: "key")
+    monkeypatch.setattr(routes, "routed_completion", routed_completion)
+    monkeypatch.setattr(routes, "model_router", ModelRouter())
+    asyncio.run(mock_db.conversations.insert_one({"conversation_id": "c1", "user_id": "u1"}))
+    asyncio.run(routes.message_store.insert_many([stored(i, "x" * 1000) for i in range(3)]))
+
+    app = FastAPI()
+    app.include_router(routes.router)
+    app.dependency_overrides[routes.get_current_user] = lambda: {"uid": "u1"}
+    response = TestClient(app).post("/conversations/c1/turn", json={"message": "and now?"})
+
+    assert response.status_code == 200
+    assert [m["content"] for m in sent["messages"][1:]] == ["x" * 1000] * 3 + ["and now?"]
+    assert sent["route"]["model"] == "mistral-medium-latest"
@@ -0,0 +1,32 @@
+import asyncio
+import gzip
+import tracemalloc
+import pytest
+
+import ndjson_transfer
+from ndjson_transfer import _iter_lines
+
+async def collect(body: bytes, gzipped: bool, chunk_size: int = 7):
+    async def chunks():
+        for start in range(0, len(body), chunk_size):
+            yield body[start:start + chunk_size]
+    return [line async for line in _iter_lines(chunks(), gzipped)]
+
+@pytest.mark.parametrize("gzipped", [False, True])
+def test_lines_split_across_chunks(gzipped):
+    body = b'{"a": 1}\n\n{"b": 2}\n{"c": 3}'
+    lines = asyncio.run(collect(gzip.compress(body) if gzipped else body, gzipped))
+    assert lines == [b'{"a": 1}', b'{"b": 2}', b'{"c": 3}']
+
+def test_gzip_bomb_is_rejected_before_inflating(monkeypatch):
+    monkeypatch.setattr(ndjson_transfer, "IMPORT_MAX_LINE_BYTES", 1024 * 1024)
+    # ~50 KB on the wire, 50 MB inflated, all one line
+    bomb = gzip.compress(b"x" * (50 * 1024 * 1024), 9)
+    tracemalloc.start()
+    try:
+        with pytest.raises(ValueError):
+            asyncio.run(collect(bomb, True, chunk_size=64 * 1024))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < 16 * 1024 * 1024
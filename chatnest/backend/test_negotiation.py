@@ -0,0 +1,39 @@
+import pytest
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+import negotiation
+from negotiation import CompressionMiddleware, accepted_encodings
+
+def test_accepted_encodings():
+    assert accepted_encodings("gzip, deflate, br") == {"gzip": 1.0, "deflate": 1.0, "br": 1.0}
+    assert accepted_encodings("br;q=0, GZIP; q=0.5, *;q=0.1") == {"br": 0.0, "gzip": 0.5, "*": 0.1}
+    assert accepted_encodings("br;q=oops") == {"br": 0.0}
+    assert accepted_encodings("") == {}
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=10)
+
+    @app.get("/text")
+    def text():
+        return PlainTextResponse("hello " * 100)
+
+    return TestClient(app)
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, br", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("gzip;q=0", None),
+    ("identity", None),
+    ("*", "br"),
+    ("*, br;q=0", "gzip"),
+])
+def test_compression_respects_q_values(client, accept_encoding, expected):
+    if negotiation.BrotliMiddleware is None and expected == "br":
+        pytest.skip("brotli-asgi is not installed")
+    response = client.get("/text", headers={"Accept-Encoding": accept_encoding})
+    assert response.headers.get("content-encoding") == expected
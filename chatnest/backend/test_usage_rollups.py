@@ -0,0 +1,101 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import routes
+import usage_rollups
+from usage_rollups import as_naive_utc
+
+def test_as_naive_utc():
+    naive = datetime(2026, 10, 1, 12, 0)
+    assert as_naive_utc(naive) is naive
+    assert as_naive_utc(None) is None
+    aware = datetime(2026, 10, 1, 14, 0, tzinfo=timezone(timedelta(hours=2)))
+    assert as_naive_utc(aware) == datetime(2026, 10, 1, 12, 0)
+
+@pytest.fixture
+def client(mock_db):
+    app = FastAPI()
+    app.include_router(routes.router)
+    app.dependency_overrides[routes.get_current_user] = lambda: {"uid": "u1"}
+    return TestClient(app)
+
+@pytest.mark.parametrize("query", [
+    "start=2026-10-01T00:00:00Z",
+    "start=2026-10-01T00:00:00%2B02:00&end=2026-10-03T00:00:00Z",
+    "start=2026-10-01T00:00:00&end=2026-10-03T00:00:00",
+])
+def test_get_usage_accepts_aware_and_naive_bounds(client, query):
+    response = client.get(f"/analytics/usage?granularity=day&{query}")
+    assert response.status_code == 200
+    assert response.json()["series"] == []
+
+def test_get_usage_rejects_empty_range(client):
+    response = client.get("/analytics/usage?start=2026-10-03T00:00:00Z&end=2026-10-01T00:00:00")
+    assert response.status_code == 400
+
+def test_record_usage_upserts_hour_and_day(mock_db):
+    async def scenario():
+        at = datetime(2026, 10, 5, 9, 30)
+        await usage_rollups.record_usage("u1", messages_sent=1, at=at)
+        await usage_rollups.record_usage("u1", ai_calls=1, ai_latency_ms=120.0, tokens=50, at=at + timedelta(minutes=10))
+        await usage_rollups.record_usage("u1", at=at)  # nothing to count
+        await usage_rollups.record_usage("", messages_sent=1, at=at)
+        return [doc async for doc in mock_db.usage_rollups.find({}, {"_id": 0, "updated_at": 0}).sort("granularity", 1)]
+
+    docs = asyncio.run(scenario())
+    counters = {"messages_sent": 1, "ai_calls": 1, "ai_latency_ms": 120.0, "tokens": 50}
+    assert docs == [
+        {"user_id": "u1", "granularity": "day", "bucket_start": datetime(2026, 10, 5), **counters},
+        {"user_id": "u1", "granularity": "hour", "bucket_start": datetime(2026, 10, 5, 9), **counters},
+    ]
+
+def test_record_usage_skips_zero_counters(mock_db):
+    async def scenario():
+        await usage_rollups.record_usage("u1", messages_sent=1, ai_calls=0, at=datetime(2026, 10, 5, 9))
+        return await mock_db.usage_rollups.find_one({"granularity": "hour"})
+
+    assert "ai_calls" not in asyncio.run(scenario())
+
+def test_query_usage_hour_day_and_week_series(mock_db):
+    # Monday 2026-10-05 and the following Monday
+    events = [
+        (datetime(2026, 10, 5, 9, 0), 100.0),
+        (datetime(2026, 10, 5, 9, 40), 300.0),
+        (datetime(2026, 10, 7, 18, 0), 200.0),
+        (datetime(2026, 10, 12, 8, 0), 50.0),
+    ]
+
+    async def scenario():
+        for at, latency in events:
+            await usage_rollups.record_usage("u1", messages_sent=1, ai_calls=1, ai_latency_ms=latency, tokens=10, at=at)
+        await usage_rollups.record_usage("u2", messages_sent=5, at=datetime(2026, 10, 5, 9))
+        start, end = datetime(2026, 10, 5), datetime(2026, 10, 19)
+        return [await usage_rollups.query_usage("u1", granularity, start, end) for granularity in ("hour", "day", "week")]
+
+    hours, days, weeks = asyncio.run(scenario())
+    assert [(p["bucket_start"], p["messages_sent"], p["avg_ai_latency_ms"]) for p in hours] == [
+        (datetime(2026, 10, 5, 9), 2, 200.0),
+        (datetime(2026, 10, 7, 18), 1, 200.0),
+        (datetime(2026, 10, 12, 8), 1, 50.0),
+    ]
+    assert [(p["bucket_start"], p["messages_sent"]) for p in days] == [
+        (datetime(2026, 10, 5), 2),
+        (datetime(2026, 10, 7), 1),
+        (datetime(2026, 10, 12), 1),
+    ]
+    assert [(p["bucket_start"], p["messages_sent"], p["ai_calls"], p["tokens"], p["avg_ai_latency_ms"]) for p in weeks] == [
+        (datetime(2026, 10, 5), 3, 3, 30, 200.0),
+        (datetime(2026, 10, 12), 1, 1, 10, 50.0),
+    ]
+
+def test_query_usage_without_ai_calls_has_no_average(mock_db):
+    async def scenario():
+        await usage_rollups.record_usage("u1", messages_sent=2, at=datetime(2026, 10, 5, 9))
+        return await usage_rollups.query_usage("u1", "day", datetime(2026, 10, 5), datetime(2026, 10, 6))
+
+    (point,) = asyncio.run(scenario())
+    assert point["messages_sent"] == 2
+    assert point["avg_ai_latency_ms"] is None
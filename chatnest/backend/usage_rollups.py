@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from pymongo import UpdateOne
+from db import db, ANALYTICS_READ_PREFERENCE
+
+# Granularities stored in db.usage_rollups; weekly series are summed from daily documents
+STORED_GRANULARITIES = ("hour", "day")
+GRANULARITIES = ("hour", "day", "week")
+COUNTERS = ("messages_sent", "ai_calls", "ai_latency_ms", "tokens")
+
+def as_naive_utc(at: Optional[datetime]) -> Optional[datetime]:
+    """Naive UTC datetime, like the ones stored in rollups, from a naive or aware one"""
+    if at is None or at.tzinfo is None:
+        return at
+    return at.astimezone(timezone.utc).replace(tzinfo=None)
+
+def bucket_start(at: datetime, granularity: str) -> datetime:
+    """Start of the hour/day/ISO week (Monday) containing `at`"""
+    if granularity == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    day = at.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+async def ensure_indexes():
+    await db.usage_rollups.create_index(
+        [("user_id", 1), ("granularity", 1), ("bucket_start", 1)], unique=True
+    )
+
+async def record_usage(user_id: str, messages_sent: int = 0, ai_calls: int = 0,
+                       ai_latency_ms: float = 0.0, tokens: int = 0, at: Optional[datetime] = None):
+    """Add an event to the user's hourly and daily rollups in one round trip.
+
+    Routes run this through the background job runner so analytics never
+    delay or fail the request that produced the event.
+    """
+    if not user_id:
+        return
+    increments = {
+        "messages_sent": messages_sent,
+        "ai_calls": ai_calls,
+        "ai_latency_ms": round(ai_latency_ms, 2),
+        "tokens": tokens,
+    }
+    increments = {field: value for field, value in increments.items() if value}
+    if not increments:
+        return
+
+    at = at or datetime.utcnow()
+    operations = [
+        UpdateOne(
+            {"user_id": user_id, "granularity": granularity, "bucket_start": bucket_start(at, granularity)},
+            {"$inc": increments, "$set": {"updated_at": at}},
+            upsert=True
+        )
+        for granularity in STORED_GRANULARITIES
+    ]
+    await db.usage_rollups.bulk_write(operations, ordered=False)
+
+def _point(start: datetime) -> Dict[str, Any]:
+    return {"bucket_start": start, **{field: 0 for field in COUNTERS}}
+
+async def query_usage(user_id: str, granularity: str, start: datetime, end: datetime) -> List[Dict[str, Any]]:
+    """Usage series for [start, end), read only from rollup documents"""
+    source = "day" if granularity == "week" else granularity
+    cursor = db.get_collection("usage_rollups", read_preference=ANALYTICS_READ_PREFERENCE).find(
+        {
+            "user_id": user_id,
+            "granularity": source,
+            "bucket_start": {"$gte": bucket_start(start, source), "$lt": end},
+        },
+        {"_id": 0, "bucket_start": 1, **{field: 1 for field in COUNTERS}}
+    ).sort("bucket_start", 1)
+
+    series: Dict[datetime, Dict[str, Any]] = {}
+    async for doc in cursor:
+        key = bucket_start(doc["bucket_start"], granularity)
+        point = series.setdefault(key, _point(key))
+        for field in COUNTERS:
+            point[field] += doc.get(field, 0)
+
+    for point in series.values():
+        point["avg_ai_latency_ms"] = round(point["ai_latency_ms"] / point["ai_calls"], 2) if point["ai_calls"] else None
+    return list(series.values())
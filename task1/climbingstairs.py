@@ -1,8 +1,15 @@
-n = int(input("Enter the number of steps: "))
+def fib_pair(n):
+    # Fast doubling: (F(n), F(n + 1)) in O(log n) steps instead of an O(n) loop
+    if n == 0:
+        return 0, 1
+    a, b = fib_pair(n >> 1)
+    c = a * (2 * b - a)
+    d = a * a + b * b
+    return (d, c + d) if n & 1 else (c, d)
 
-a, b = 1, 1  
+n = int(input("Enter the number of steps: "))
 
-for i in range(2, n + 1):
-    a, b = b, a + b  
+# Ways to climb n steps taking 1 or 2 at a time is F(n + 1)
+ways = fib_pair(max(n, 0))[1]
 
-print("Number of distinct ways to climb:", b)
+print("Number of distinct ways to climb:", ways)
@@ -1,14 +1,28 @@
-def find_missing_number(nums):
-    n = len(nums)
+import sys
+from itertools import islice
+
+def read_numbers(stream, block_size=1 << 16):
+    # Yield integers from the stream one line (or block of a long line) at a
+    # time, so even hundreds of millions of numbers never sit in memory together
+    carry = ""
+    for block in iter(lambda: stream.readline(block_size), ""):
+        tokens = (carry + block).split()
+        carry = ""
+        if tokens and not block[-1].isspace():
+            carry = tokens.pop()
+        for token in tokens:
+            yield int(token)
+    if carry:
+        yield int(carry)
+
+def find_missing_number(nums, n):
     expected_sum = n * (n + 1) // 2
     actual_sum = sum(nums)
     return expected_sum - actual_sum
+
 size = int(input("Enter the number of elements : "))
 print(f"Enter {size} elements :")
-nums = []
-for _ in range(size):
-    num = int(input())
-    nums.append(num)
+nums = islice(read_numbers(sys.stdin), size)
 
-missing = find_missing_number(nums)
+missing = find_missing_number(nums, size)
 print("Missing number is:", missing)
@@ -0,0 +1,169 @@
+"""Benchmark climb_stairs and find_missing_number across input sizes.
+
+    python benchmark.py --max-size 100000000 --save baseline.json
+    python benchmark.py --baseline baseline.json --threshold 1.5
+
+Each case is timed (best of --repeat runs) and run once more under
+tracemalloc for its peak memory. Caches are cleared before every run, so each
+one computes from scratch. With --baseline the run exits with status 1
+when any case got slower or hungrier than the baseline by more than the
+threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from climb import _fib_pair, climb_stairs, climb_stairs_many
+from missing import (
+    CHUNK_SIZE,
+    chunked,
+    find_missing_number,
+    find_missing_number_file,
+    find_missing_number_stream,
+    find_missing_numbers,
+    np,
+    read_number_arrays,
+)
+
+MODULUS = 10 ** 9 + 7
+# Lists of 10^8 Python ints need several GB, so the list-based cases stop here
+LIST_MAX_SIZE = 10 ** 7
+# The exact answer for n = 10^8 has ~70 million bits and takes minutes; the
+# modular cases cover the large sizes
+BIGINT_MAX_SIZE = 10 ** 7
+# Differences below these are noise, whatever the ratio
+MIN_SECONDS_DELTA = 0.001
+MIN_BYTES_DELTA = 64 * 1024
+
+def _numbers(n, missing):
+    return (i for i in range(1, n + 1) if i not in missing)
+
+def _binary_file(directory, n, missing):
+    path = os.path.join(directory, f"nums-{n}-{len(missing)}.bin")
+    if not os.path.exists(path):
+        with open(path, "wb") as f:
+            for start in range(1, n + 1, CHUNK_SIZE):
+                chunk = np.arange(start, min(start + CHUNK_SIZE, n + 1), dtype=np.int64)
+                chunk[~np.isin(chunk, list(missing))].tofile(f)
+    return path
+
+def cases(directory):
+    # name -> (max size or None, setup(n) returning a zero-argument callable,
+    # reset() called before every run or None)
+    reset_climb = _fib_pair.cache_clear  # otherwise every run after the first is a cache hit
+    yield "climb_stairs", BIGINT_MAX_SIZE, lambda n: lambda: climb_stairs(n), reset_climb
+    yield "climb_stairs_mod", None, lambda n: lambda: climb_stairs(n, MODULUS), reset_climb
+    yield "climb_stairs_many_mod", None, lambda n: lambda: climb_stairs_many(range(n - 100, n), MODULUS), reset_climb
+
+    def missing_list(n):
+        nums = list(_numbers(n, {n // 2}))
+        return lambda: find_missing_number(nums, n)
+    yield "find_missing_number", LIST_MAX_SIZE, missing_list, None
+    yield "find_missing_number_stream", None, lambda n: lambda: find_missing_number_stream(chunked(_numbers(n, {n // 2})), n), None
+
+    if np is None:
+        return
+
+    def missing_file(n):
+        path = _binary_file(directory, n, {n // 2})
+        return lambda: find_missing_number_file(path, n, binary=True)
+    yield "find_missing_number_file", None, missing_file, None
+
+    def missing_many(n):
+        missing = {1, n // 3, n // 2} if n > 3 else {1}
+        path = _binary_file(directory, n, missing)
+        return lambda: find_missing_numbers(lambda: read_number_arrays(path, binary=True), n)
+    yield "find_missing_numbers_file", None, missing_many, None
+
+def measure(func, repeat, reset=None):
+    best = None
+    for _ in range(repeat):
+        if reset:
+            reset()
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    if reset:
+        reset()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "peak_bytes": peak}
+
+def run(sizes, repeat=3, only=None, log=print):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, max_size, setup, reset in cases(directory):
+            if only and name not in only:
+                continue
+            for n in sizes:
+                if max_size is not None and n > max_size:
+                    continue
+                result = measure(setup(n), repeat, reset)
+                results.setdefault(name, {})[str(n)] = result
+                log(f"{name:30} n={n:<12} {result['seconds'] * 1000:12.3f} ms {result['peak_bytes'] / 1024:12.1f} KiB")
+    return results
+
+def compare(baseline, current, threshold, memory_threshold=None):
+    # Regressions of `current` against `baseline`, as readable strings. Cases
+    # or sizes missing from either run are not compared.
+    memory_threshold = threshold if memory_threshold is None else memory_threshold
+    regressions = []
+    for name, sizes in current.items():
+        for size, result in sizes.items():
+            before = baseline.get(name, {}).get(size)
+            if not before:
+                continue
+            seconds, old_seconds = result["seconds"], before["seconds"]
+            if seconds > old_seconds * threshold and seconds - old_seconds > MIN_SECONDS_DELTA:
+                regressions.append(f"{name} n={size}: {old_seconds * 1000:.3f} ms -> {seconds * 1000:.3f} ms")
+            peak, old_peak = result["peak_bytes"], before["peak_bytes"]
+            if peak > old_peak * memory_threshold and peak - old_peak > MIN_BYTES_DELTA:
+                regressions.append(f"{name} n={size}: {old_peak} B -> {peak} B peak memory")
+    return regressions
+
+def sizes_up_to(max_size):
+    sizes = []
+    n = 10
+    while n <= max_size:
+        sizes.append(n)
+        n *= 10
+    return sizes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the task algorithms")
+    parser.add_argument("--max-size", type=int, default=10 ** 6, help="largest input size (powers of 10 from 10)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case, the best one counts")
+    parser.add_argument("--case", action="append", dest="cases", help="only run this case (repeatable)")
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this JSON file")
+    parser.add_argument("--threshold", type=float, default=1.5, help="allowed slowdown ratio")
+    parser.add_argument("--memory-threshold", type=float, help="allowed peak memory ratio (default: --threshold)")
+    args = parser.parse_args(argv)
+
+    results = run(sizes_up_to(args.max_size), args.repeat, args.cases)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": platform.python_version(), "results": results}, f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(baseline, results, args.threshold, args.memory_threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("No regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
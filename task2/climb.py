@@ -1,11 +1,52 @@
-def climb_stairs(n):
-    if n < 0:
+from functools import lru_cache
+
+# Gaps up to this size between batched n are bridged with additions, which
+# is cheaper than another O(log n) doubling chain
+STEP_LIMIT = 64
+
+@lru_cache(maxsize=512)
+def _fib_pair(n, modulus=None):
+    # Fast doubling: returns (F(n), F(n + 1)) in O(log n) multiplications
+    if n == 0:
+        return 0, 1
+    a, b = _fib_pair(n >> 1, modulus)
+    c = a * (2 * b - a)
+    d = a * a + b * b
+    if modulus is not None:
+        c %= modulus
+        d %= modulus
+    if n & 1:
+        e = c + d
+        return d, e % modulus if modulus is not None else e
+    return c, d
+
+def _check_modulus(modulus):
+    if modulus is not None and modulus < 1:
+        raise ValueError("modulus must be a positive integer")
+
+def climb_stairs(n, modulus=None):
+    _check_modulus(modulus)
+    if n <= 0:
         return 0
-    elif n == 0:
-        return 0
-    elif n == 1:
-        return 1
-    a, b = 1, 1
-    for i in range(2, n + 1):
-        a, b = b, a + b
-    return b
+    # Ways to climb n steps taking 1 or 2 at a time is F(n + 1)
+    return _fib_pair(n, modulus)[1]
+
+def climb_stairs_many(ns, modulus=None):
+    _check_modulus(modulus)
+    results = {}
+    previous = None  # (n, F(n), F(n + 1)) of the last value computed
+    for n in sorted(set(ns)):
+        if n <= 0:
+            results[n] = 0
+            continue
+        if previous is not None and n - previous[0] <= STEP_LIMIT:
+            k, a, b = previous
+            for _ in range(n - k):
+                a, b = b, a + b
+                if modulus is not None:
+                    b %= modulus
+        else:
+            a, b = _fib_pair(n, modulus)
+        previous = (n, a, b)
+        results[n] = b
+    return [results[n] for n in ns]
@@ -1,4 +1,157 @@
+import os
+from bisect import bisect_right
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:  # The vectorized path is optional
+    np = None
+
+CHUNK_SIZE = 1 << 20  # numbers per array chunk, or bytes per chunk of text
+LIST_CHUNK_SIZE = 1 << 16  # numbers per list chunk; Python ints take ~36 bytes each
+BUCKETS = 1024  # ranges counted per pass by find_missing_numbers
+
 def find_missing_number(nums, n):
     expected_sum = n * (n + 1) // 2
     actual_sum = sum(nums)
     return expected_sum - actual_sum
+
+def chunked(values, size=LIST_CHUNK_SIZE):
+    # Lists of up to `size` numbers from any iterable, without materialising it
+    values = iter(values)
+    while True:
+        chunk = list(islice(values, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _read_blocks(source, block_size):
+    if isinstance(source, (str, bytes, os.PathLike)):
+        with open(source, "rb") as f:
+            yield from iter(lambda: f.read(block_size), b"")
+        return
+    for block in iter(lambda: source.read(block_size), source.read(0)):
+        yield block.encode() if isinstance(block, str) else block
+
+def read_number_chunks(source, block_size=CHUNK_SIZE):
+    # Lists of the whitespace-separated integers in a text file (a path or an
+    # open file), read one block at a time. A number cut off at the end of a
+    # block is carried over to the next one.
+    carry = b""
+    for block in _read_blocks(source, block_size):
+        tokens = (carry + block).split()
+        carry = b""
+        if tokens and not block[-1:].isspace():
+            carry = tokens.pop()
+        if tokens:
+            yield [int(token) for token in tokens]
+    if carry:
+        yield [int(carry)]
+
+def _chunk_sum(chunk):
+    if np is not None and isinstance(chunk, np.ndarray):
+        return int(chunk.sum(dtype=np.int64))
+    return sum(chunk)
+
+def find_missing_number_stream(chunks, n):
+    # Like find_missing_number, over an iterable of number chunks (lists or
+    # NumPy arrays), e.g. chunked(values) or read_number_chunks(path)
+    actual_sum = 0
+    for chunk in chunks:
+        actual_sum += _chunk_sum(chunk)
+    return n * (n + 1) // 2 - actual_sum
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("numpy is required for the vectorized path")
+
+def read_number_arrays(path, binary=False, dtype="int64", chunk_size=CHUNK_SIZE):
+    # NumPy arrays over a memory-mapped file: raw `dtype` values when binary,
+    # otherwise whitespace-separated integers in text. Only one
+    # chunk is ever resident, whatever the file size.
+    _require_numpy()
+    if os.path.getsize(path) == 0:
+        return
+    if binary:
+        data = np.memmap(path, dtype=dtype, mode="r")
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+        return
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    start = 0
+    while start < len(data):
+        end = min(start + chunk_size, len(data))
+        if end < len(data):
+            # Cut the block after its last whitespace so no number is split
+            whitespace = np.flatnonzero(data[start:end] <= 32)
+            if len(whitespace):
+                end = start + int(whitespace[-1]) + 1
+            else:
+                following = np.flatnonzero(data[end:] <= 32)
+                end = end + int(following[0]) + 1 if len(following) else len(data)
+        # sep=" " makes NumPy parse the block as text, splitting on any whitespace
+        yield np.fromstring(data[start:end].tobytes(), dtype=np.int64, sep=" ")
+        start = end
+
+def find_missing_number_file(path, n, binary=False, dtype="int64", chunk_size=CHUNK_SIZE):
+    return find_missing_number_stream(read_number_arrays(path, binary, dtype, chunk_size), n)
+
+def _count_pass(chunks, ranges, buckets):
+    # Count how many values fall in each bucket of each (lo, hi, width) range
+    starts = [lo for lo, _, _ in ranges]
+    counts = [[0] * -(-(hi - lo + 1) // width) for lo, hi, width in ranges]
+    array_totals = None
+    for chunk in chunks:
+        if np is not None and isinstance(chunk, np.ndarray):
+            if array_totals is None:
+                lows = np.array(starts, dtype=np.int64)
+                highs = np.array([hi for _, hi, _ in ranges], dtype=np.int64)
+                widths = np.array([width for _, _, width in ranges], dtype=np.int64)
+                array_totals = np.zeros(len(ranges) * buckets, dtype=np.int64)
+            index = np.searchsorted(lows, chunk, side="right") - 1
+            valid = index >= 0
+            index, values = index[valid], chunk[valid]
+            inside = values <= highs[index]
+            index, values = index[inside], values[inside]
+            flat = index * buckets + (values - lows[index]) // widths[index]
+            array_totals += np.bincount(flat, minlength=len(array_totals))
+            continue
+        for value in chunk:
+            i = bisect_right(starts, value) - 1
+            if i >= 0 and value <= ranges[i][1]:
+                counts[i][(value - ranges[i][0]) // ranges[i][2]] += 1
+    if array_totals is not None:
+        for i, row in enumerate(counts):
+            for b, total in enumerate(array_totals[i * buckets:i * buckets + len(row)].tolist()):
+                row[b] += total
+    return counts
+
+def find_missing_numbers(chunk_source, n, k=None, buckets=BUCKETS):
+    # Sorted values of 1..n missing from the input, which must hold distinct
+    # numbers. `chunk_source` is called once per pass and must return a fresh
+    # iterable of chunks, e.g. lambda: read_number_chunks(path).
+    #
+    # Each pass splits every range still known to contain missing values into
+    # `buckets` sub-ranges and counts the values in them; a sub-range holding
+    # fewer values than its width is searched in the next pass. That takes
+    # about log(n) / log(buckets) passes and O(k * buckets) memory.
+    missing = []
+    pending = [(1, n)] if n >= 1 else []
+    while pending:
+        ranges = [(lo, hi, -(-(hi - lo + 1) // buckets)) for lo, hi in pending]
+        counts = _count_pass(chunk_source(), ranges, buckets)
+        pending = []
+        for (lo, hi, width), row in zip(ranges, counts):
+            for b, total in enumerate(row):
+                sub_lo = lo + b * width
+                sub_hi = min(hi, sub_lo + width - 1)
+                if total >= sub_hi - sub_lo + 1:
+                    continue
+                if sub_lo == sub_hi:
+                    missing.append(sub_lo)
+                else:
+                    pending.append((sub_lo, sub_hi))
+        # Each pending range is now known to hold at least one missing value
+        if k is not None and len(pending) + len(missing) > k:
+            raise ValueError(f"more than {k} numbers are missing")
+    return sorted(missing)
@@ -0,0 +1,46 @@
+import pytest
+from benchmark import compare, run, sizes_up_to
+
+def result(seconds, peak_bytes=1000):
+    return {"seconds": seconds, "peak_bytes": peak_bytes}
+
+def test_sizes_up_to():
+    assert sizes_up_to(5) == []
+    assert sizes_up_to(10) == [10]
+    assert sizes_up_to(10 ** 4) == [10, 100, 1000, 10000]
+
+@pytest.mark.parametrize("seconds, threshold, regressed", [
+    (0.10, 1.5, False),
+    (0.14, 1.5, False),
+    (0.16, 1.5, True),
+    (0.16, 2.0, False),
+])
+def test_compare_time(seconds, threshold, regressed):
+    baseline = {"climb_stairs": {"1000": result(0.10)}}
+    current = {"climb_stairs": {"1000": result(seconds)}}
+    assert bool(compare(baseline, current, threshold)) == regressed
+
+def test_compare_ignores_noise():
+    # Ten times slower, but by less than a millisecond
+    assert compare({"a": {"10": result(0.00001)}}, {"a": {"10": result(0.0001)}}, 1.5) == []
+
+def test_compare_memory():
+    baseline = {"a": {"10": result(0.1, 1 << 20)}}
+    current = {"a": {"10": result(0.1, 4 << 20)}}
+    assert len(compare(baseline, current, 1.5)) == 1
+    assert compare(baseline, current, 1.5, memory_threshold=5) == []
+
+def test_compare_skips_unknown_cases():
+    assert compare({"a": {"10": result(0.1)}}, {"a": {"100": result(9)}, "b": {"10": result(9)}}, 1.5) == []
+
+def test_run_small_sizes():
+    results = run([10, 100], repeat=1, only=["climb_stairs", "find_missing_number_stream"], log=lambda line: None)
+    assert set(results) == {"climb_stairs", "find_missing_number_stream"}
+    assert set(results["climb_stairs"]) == {"10", "100"}
+    assert results["climb_stairs"]["10"]["seconds"] >= 0
+
+def test_run_times_real_work():
+    # The cached fast doubling must not turn every timed run into a cache hit
+    results = run([100, 100000], repeat=2, only=["climb_stairs"], log=lambda line: None)["climb_stairs"]
+    assert results["100000"]["seconds"] > 10 * results["100"]["seconds"]
+    assert results["100000"]["peak_bytes"] > 10 * results["100"]["peak_bytes"]
@@ -1,4 +1,5 @@
-from climb import climb_stairs
+import pytest
+from climb import climb_stairs, climb_stairs_many
 
 def test_climb_stairs():
     assert climb_stairs(0) == 0
@@ -7,3 +8,33 @@ def test_climb_stairs():
     assert climb_stairs(3) == 3
     assert climb_stairs(4) == 5
     assert climb_stairs(5) == 8
+
+def climb_stairs_loop(n):
+    a, b = 1, 1
+    for i in range(2, n + 1):
+        a, b = b, a + b
+    return b
+
+def test_climb_stairs_large():
+    for n in (10, 93, 94, 1000, 4097):
+        assert climb_stairs(n) == climb_stairs_loop(n)
+
+def test_climb_stairs_negative():
+    assert climb_stairs(-3) == 0
+
+def test_climb_stairs_modulus():
+    modulus = 10 ** 9 + 7
+    for n in (1, 2, 50, 1000):
+        assert climb_stairs(n, modulus) == climb_stairs_loop(n) % modulus
+    assert climb_stairs(10 ** 5, modulus) == climb_stairs(10 ** 5) % modulus
+    assert climb_stairs(5, 1) == 0
+
+def test_climb_stairs_invalid_modulus():
+    with pytest.raises(ValueError):
+        climb_stairs(5, 0)
+
+def test_climb_stairs_many():
+    ns = [5, 0, 300, 3, 5, 301, 2000, -1]
+    assert climb_stairs_many(ns) == [climb_stairs(n) for n in ns]
+    assert climb_stairs_many(ns, 97) == [climb_stairs(n, 97) for n in ns]
+    assert climb_stairs_many([]) == []
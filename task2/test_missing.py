@@ -1,5 +1,14 @@
+import io
 import pytest
-from missing import find_missing_number
+from missing import (
+    chunked,
+    find_missing_number,
+    find_missing_number_file,
+    find_missing_number_stream,
+    find_missing_numbers,
+    read_number_arrays,
+    read_number_chunks,
+)
 
 @pytest.mark.parametrize("nums, n, expected", [
     ([1, 2, 4, 5], 5, 3),
@@ -7,3 +16,44 @@ from missing import find_missing_number
 ])
 def test_find_missing_number(nums, n, expected):
     assert find_missing_number(nums, n) == expected
+
+@pytest.mark.parametrize("nums, n, expected", [
+    ([1, 2, 4, 5], 5, 3),
+    ([2, 3, 1, 5], 5, 4),
+])
+def test_find_missing_number_stream(nums, n, expected):
+    assert find_missing_number_stream(chunked(iter(nums), 3), n) == expected
+
+def write_numbers(path, n, missing):
+    path.write_text("\n".join(str(i) for i in range(n, 0, -1) if i not in missing) + "\n")
+    return path
+
+def test_read_number_chunks_across_blocks(tmp_path):
+    path = write_numbers(tmp_path / "nums.txt", 1000, {512})
+    chunks = list(read_number_chunks(path, block_size=7))
+    assert len(chunks) > 1
+    assert sorted(n for chunk in chunks for n in chunk) == [i for i in range(1, 1001) if i != 512]
+    assert find_missing_number_stream(read_number_chunks(io.StringIO("1 2  4\n5"), 3), 5) == 3
+
+@pytest.mark.parametrize("missing", [[1], [3, 4], [1, 250, 999, 1000]])
+def test_find_missing_numbers(missing):
+    nums = [i for i in range(1, 1001) if i not in missing]
+    assert find_missing_numbers(lambda: chunked(nums, 64), 1000, k=len(missing), buckets=8) == missing
+
+def test_find_missing_numbers_none_missing():
+    assert find_missing_numbers(lambda: chunked(range(1, 11)), 10) == []
+    assert find_missing_numbers(lambda: chunked(range(1, 11)), 10, k=0) == []
+
+def test_find_missing_numbers_more_than_k():
+    with pytest.raises(ValueError):
+        find_missing_numbers(lambda: chunked(range(1, 6)), 10, k=2)
+
+def test_find_missing_number_file_vectorized(tmp_path):
+    np = pytest.importorskip("numpy")
+    text = write_numbers(tmp_path / "nums.txt", 5000, {4321})
+    assert find_missing_number_file(text, 5000, chunk_size=100) == 4321
+
+    binary = tmp_path / "nums.bin"
+    np.array([i for i in range(1, 5001) if i not in (7, 4321)], dtype=np.int32).tofile(binary)
+    assert find_missing_numbers(lambda: read_number_arrays(binary, True, "int32", 333), 5000, k=2) == [7, 4321]
+    assert find_missing_numbers(lambda: read_number_arrays(text, chunk_size=100), 5000) == [4321]